@@ -0,0 +1,54 @@
+import argparse, time
+import numpy as np
+from core import Mode, TieBreak, SortKernel, XiSort, _Workspace, _build_run, F_TIE, F_VAL
+
+# ────────────────────── timing helpers ────────────────────
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0   = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _run_formation(vals: np.ndarray, flags: int, kernel: SortKernel, repeat: int) -> float:
+    """Seconds to turn ``vals`` into one sorted run (keys, order, records)."""
+    ws  = _Workspace(len(vals), flags)
+    tie = np.random.default_rng(1).random(len(vals)) if flags & F_TIE else None
+    eps = 0.01 if flags & F_VAL else None
+    def once():
+        ws.vals[:] = vals
+        _build_run(ws, len(vals), tie, flags, eps, kernel)
+    return _best(once, repeat)
+
+# ────────────────────── main / args ───────────────────────
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ΞSort run-formation sort kernels")
+    ap.add_argument("--sizes",  type=int, nargs="+", default=[1 << 12, 1 << 16, 1 << 20, 1 << 22],
+                    help="Chunk sizes to time, in values")
+    ap.add_argument("--repeat", type=int, default=3,
+                    help="Timings per case; the best is reported")
+    ap.add_argument("--stream", type=int, default=0,
+                    help="Also time a whole stream_sort of this many values per kernel")
+    args = ap.parse_args()
+
+    formats = {"value/strict": 0, "random/strict": F_TIE, "value/curved": F_VAL}
+    kernels = [SortKernel.NUMPY, SortKernel.RADIX, SortKernel.AUTO]
+    rng     = np.random.default_rng(0)
+
+    print(f"{'format':<14} {'n':>9} " + " ".join(f"{k.value + ' ms':>10}" for k in kernels))
+    for name, flags in formats.items():
+        for n in args.sizes:
+            vals = rng.standard_normal(n)
+            ms   = [1e3 * _run_formation(vals, flags, k, args.repeat) for k in kernels]
+            print(f"{name:<14} {n:>9,} " + " ".join(f"{t:>10.2f}" for t in ms))
+
+    if args.stream:
+        src = rng.standard_normal(args.stream)
+        print(f"\nstream_sort of {args.stream:,} values, tie-break random, 8 chunks:")
+        for k in kernels:
+            def once():
+                srt = XiSort(seed=1, tie_break=TieBreak.RANDOM, mode=Mode.STRICT, sort_kernel=k, mem_limit=1)
+                for _ in srt.stream_sort_blocks(src, chunk_size=-(-args.stream // 8)):
+                    pass
+            print(f"  {k.value:<6} {_best(once, args.repeat):8.3f} s")
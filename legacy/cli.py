@@ -1,6 +1,6 @@
 import os, sys, argparse, time
 import numpy as np
-from core import VERSION, Mode, TieBreak, XiSort, _R
+from core import VERSION, Mode, TieBreak, SortKernel, Durability, Specials, XiSort, _R
 
 # ────────────────────── CLI self-test ─────────────────────
 def _selftest():
@@ -45,10 +45,39 @@ if __name__ == "__main__":
                     help="Disable chunk Blake3 tags")
     ap.add_argument("--soft-verify", action="store_true",
                     help="Warn instead of error on tag mismatch")
+    ap.add_argument("--max-fan-in", type=int, default=128,
+                    help="Most runs merged at once; more runs are merged in passes")
+    ap.add_argument("--io-threads", type=int, default=0,
+                    help="Background threads for run writes and read-ahead (0 = synchronous)")
+    ap.add_argument("--io-depth",   type=int, default=2,
+                    help="Most chunk writes in flight with --io-threads")
+    ap.add_argument("--workers",    type=int, default=0,
+                    help="Threads building chunk runs in parallel (0 = serial)")
+    ap.add_argument("--verify-first", action="store_true",
+                    help="Check every chunk tag before emitting any output")
+    ap.add_argument("--merge-window", type=int, default=4 * 1024 * 1024,
+                    help="Bytes buffered per run during the merge")
+    ap.add_argument("--durability", type=Durability, choices=list(Durability),
+                    default=Durability.BATCH, help="Scratch fsync policy: none, batch, or strict (every run)")
+    ap.add_argument("--sync-every", type=int, default=16,
+                    help="Runs per directory fsync with --durability batch")
+    ap.add_argument("--sort-kernel", type=SortKernel, choices=list(SortKernel),
+                    default=SortKernel.AUTO, help="Chunk sort: radix, numpy, or auto by chunk size")
+    ap.add_argument("--replacement-selection", action="store_true",
+                    help="Form runs by replacement selection (longer runs, fewer merges)")
+    ap.add_argument("--specials",   type=Specials, choices=list(Specials),
+                    default=Specials.TAIL, help="Non-finite placement: tail, inf (±inf in the runs), or inline (default-payload "
+                         "NaN too; other NaN payloads keep the tail)")
+    ap.add_argument("--no-count-specials", action="store_false", dest="count_specials",
+                    help="Write ±inf, ±0 and NaN as records/tail values instead of run-length counts")
+    ap.add_argument("--mem-limit",  type=int, default=None,
+                    help="RAM budget in bytes for sizing chunks (default: half the free RAM)")
 
     # quality-of-life
     ap.add_argument("--count",    type=int, default=1_000_000,
                     help="How many random doubles to sort (default 1 000 000)")
+    ap.add_argument("--limit",    type=int, default=None,
+                    help="Emit only the first N sorted values (no scratch runs)")
     ap.add_argument("--verify-sorted", action="store_true",
                     help="Abort on first out-of-order value (single pass)")
     ap.add_argument("--progress", action="store_true",
@@ -73,12 +102,25 @@ if __name__ == "__main__":
         tmpdir                = args.tmpdir,
         integrity             = args.integrity,
         soft_verify           = args.soft_verify,
+        merge_window          = args.merge_window,
+        verify_first          = args.verify_first,
+        max_fan_in            = args.max_fan_in,
+        io_threads            = args.io_threads,
+        io_depth              = args.io_depth,
+        workers               = args.workers,
+        mem_limit             = args.mem_limit,
+        replacement_selection = args.replacement_selection,
+        sort_kernel           = args.sort_kernel,
+        durability            = args.durability,
+        sync_every            = args.sync_every,
+        specials              = args.specials,
+        count_specials        = args.count_specials,
     )
     sorter = XiSort(**sorter_options)
 
     # ── create synthetic input stream ──────────────────────────────────────
     rng_np = np.random.default_rng(0)
-    src    = (x for x in rng_np.standard_normal(args.count))
+    src    = rng_np.standard_normal(args.count)
 
     print(f"ΞSort {VERSION} running with options: {sorter_options}")
     print(f"Sorting {args.count:,} standard-normal values…")
@@ -91,15 +133,19 @@ if __name__ == "__main__":
 
     last_val = -float("inf")                        # for --verify-sorted
 
-    for val in sorter.stream_sort(src):
-        if output_count < 10:
-            first_ten.append(val)
+    for blk in sorter.stream_sort_blocks(src, limit=args.limit):
+        if len(first_ten) < 10:
+            first_ten.extend(blk[:10 - len(first_ten)].tolist())
 
-        if args.verify_sorted and val < last_val:
-            raise RuntimeError(f"Out-of-order value at index {output_count}: "
-                               f"{val} < {last_val}")
-        last_val = val
-        output_count += 1
+        if args.verify_sorted:
+            prev = np.concatenate(([last_val], blk[:-1]))
+            bad  = np.flatnonzero(blk < prev)
+            if bad.size:
+                i = bad[0]
+                raise RuntimeError(f"Out-of-order value at index {output_count + i}: "
+                                   f"{blk[i]} < {prev[i]}")
+            last_val = blk[-1]
+        output_count += blk.size
 
         if args.progress and output_count >= next_milestone:
             now = time.monotonic()
@@ -111,6 +157,7 @@ if __name__ == "__main__":
 
     # ── summary ────────────────────────────────────────────────────────────
     print(f"Sorting complete. Total numbers sorted: {output_count:,}")
+    print("Chunk presortedness:", sorter.stats)
 
     if first_ten:
         formatted = [f"{x:.3f}..." if np.isfinite(x) else str(x) for x in first_ten]
@@ -1,5 +1,7 @@
 from __future__ import annotations
-import os, sys, math, mmap, time, itertools, tempfile, heapq, contextlib, warnings, hmac
+import os, sys, math, mmap, time, array, bisect, struct, operator, itertools, tempfile, contextlib, warnings, hmac
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from typing import Iterable, Generator, List
 import numpy as np, blake3
@@ -13,82 +15,145 @@ MASK = np.uint64(0x8000_0000_0000_0000)
 SENT = np.uint64(0xFFFF_FFFF_FFFF_FFF8)
 K_NEGINF, K_POSINF, K_NEG0, K_POS0, K_NAN = [SENT + i for i in range(5)]
 
-def ieee_key(a: np.ndarray) -> np.ndarray:
+_SIGNED_SHIFT = np.int64(63)
+_MAG_SPECIAL  = np.uint64(0xFFDF_FFFF_FFFF_FFFE)   # (|bits| << 1) - 1 ≥ this: ±0, ±inf or NaN
+
+def ieee_key(a: np.ndarray, out: np.ndarray | None = None, finite_inf: bool = False) -> np.ndarray:
+    """Order-preserving uint64 key of float64 ``a`` (into ``out`` if given).
+
+    Finite non-zero values take the sign-flip transform of ``double_to_key``,
+    ``bits ^ ((bits >>ₐ 63) | MASK)``, done as in-place passes over ``out``.
+    ±inf, ±0 and NaN get the sentinels ``K_NEGINF < K_POSINF < K_NEG0 <
+    K_POS0 < K_NAN`` above every finite key; they are found by one max-reduction
+    and patched by index only when present.  With ``finite_inf`` ±inf keep
+    their transform instead, just below and above every finite key.
+    """
+    if not a.dtype.isnative:
+        a = a.astype(a.dtype.newbyteorder("="))
     bits = a.view(np.uint64)
-    if not bits.dtype.isnative:
-        bits = bits.byteswap().newbyteorder()
-    key  = np.empty_like(bits)
-    neg  = (bits & MASK) != 0
-    key[neg]  = ~bits[neg]
-    key[~neg] = bits[~neg] | MASK
-    key[np.isneginf(a)] = K_NEGINF
-    key[np.isposinf(a)] = K_POSINF
-    z = a == 0.0
-    key[z & np.signbit(a)]  = K_NEG0
-    key[z & ~np.signbit(a)] = K_POS0
-    key[np.isnan(a)] = K_NAN
+    key  = np.empty_like(bits) if out is None else out
+
+    np.left_shift(bits, np.uint64(1), out=key)              # magnitude bits, sign dropped
+    key -= np.uint64(1)                                     # zero wraps to the top
+    sp = np.flatnonzero(key >= _MAG_SPECIAL) if key.size and key.max() >= _MAG_SPECIAL else None
+
+    sign = key.view(np.int64)
+    np.right_shift(bits.view(np.int64), _SIGNED_SHIFT, out=sign)   # 0 or all ones
+    key |= MASK
+    key ^= bits
+
+    if sp is not None:
+        v, neg = a[sp], (bits[sp] >> np.uint64(63)).astype(bool)
+        cls    = np.where(v == 0.0, 2, 0) + ~neg               # -inf, +inf, -0, +0
+        cls[np.isnan(v)] = 4
+        if finite_inf:
+            keep     = cls >= 2
+            sp, cls  = sp[keep], cls[keep]
+        key[sp] = SENT + cls.astype(np.uint64)
     return key
 
-# ────────────────────── minimal xoshiro256** ──────────────
+_SPECIAL = np.array([-np.inf, np.inf, -0.0, 0.0, np.nan])
+_QNAN    = np.uint64(0x7FF8_0000_0000_0000)                 # the NaN ieee_val gives back for K_NAN
+
+def ieee_val(key: np.ndarray) -> np.ndarray:
+    """Inverse of :func:`ieee_key` (NaN payloads come back as the default NaN)."""
+    out = np.where((key & MASK) != 0, key ^ MASK, ~key).view(F64)
+    sp  = key >= SENT
+    if sp.any():
+        out[sp] = _SPECIAL[(key[sp] - SENT).astype(np.intp)]
+    return out
+
+# ────────────────────── vectorised xoshiro256** ───────────
+_U = np.uint64
+M64 = (1 << 64) - 1
+
+def _sm64(x: np.ndarray) -> np.ndarray:
+    x = x + _U(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> _U(30))) * _U(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> _U(27))) * _U(0x94D049BB133111EB)
+    return x ^ (x >> _U(31))
+
+def _rotl(x: np.ndarray, k: int) -> np.ndarray:
+    return (x << _U(k)) | (x >> _U(64 - k))
+
 class _R:
-    """Small, deterministic PRNG (xoshiro256**) with vector helpers."""
-    __slots__ = ("s",)
+    """Deterministic xoshiro256** PRNG running ``LANES`` generators side by side.
 
-    @staticmethod
-    def _rotl(x: int, k: int) -> int:
-        return ((x << k) & 0xFFFFFFFFFFFFFFFF) | (x >> (64 - k))
+    Stream definition (stable across releases, relied on by
+    ``require_deterministic``):
+
+    * lane ``j`` is a xoshiro256** state seeded with words
+      ``sm64(seed + 4*j + i)`` for ``i = 0..3`` (SplitMix64 finaliser, mod 2**64);
+    * word ``t`` of the stream is output number ``t // LANES`` of lane
+      ``t % LANES``;
+    * every helper consumes words from that one stream in order, and words
+      left over from a refill are kept for the next call, so the stream does
+      not depend on how draws are split across calls.
+    """
+    __slots__ = ("s", "_pool", "_pos")
+    LANES = 1024
 
     def __init__(self, seed: int):
-        def sm64(x: int) -> int:
-            x = (x + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
-            x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF
-            x = (x ^ (x >> 27)) * 0x94D049BB133111EB & 0xFFFFFFFFFFFFFFFF
-            return x ^ (x >> 31)
-        self.s = [sm64(seed + i) for i in range(4)]
-
-    def _next(self) -> int:
+        base      = np.arange(4 * self.LANES, dtype=np.uint64) + _U(seed & M64)
+        self.s    = _sm64(base).reshape(self.LANES, 4).T.copy()
+        self._pool = np.empty(0, dtype=np.uint64)
+        self._pos  = 0
+
+    def _refill(self, steps: int) -> np.ndarray:
         s0, s1, s2, s3 = self.s
-        res = (self._rotl(s1 * 5, 7) * 9) & 0xFFFFFFFFFFFFFFFF
-        t   = (s1 << 17) & 0xFFFFFFFFFFFFFFFF
-        s2 ^= s0; s3 ^= s1; s1 ^= s2; s0 ^= s3
-        s2 ^= t;  s3 = self._rotl(s3, 45)
-        self.s = [s0, s1, s2, s3]
-        return res
-
-    def rand(self, n: int) -> np.ndarray:
-        raw = np.empty(n, dtype=np.uint64)
-        for i in range(0, n, 4):
-            raw[i] = self._next()
-            if i+1 < n: raw[i+1] = self._next()
-            if i+2 < n: raw[i+2] = self._next()
-            if i+3 < n: raw[i+3] = self._next()
-        raw >>= 11
-        out = raw.astype(np.float64)
-        out *= (2**-53)
+        out = np.empty((steps, self.LANES), dtype=np.uint64)
+        for row in out:
+            row[:] = _rotl(s1 * _U(5), 7) * _U(9)
+            t      = s1 << _U(17)
+            s2 ^= s0; s3 ^= s1; s1 ^= s2; s0 ^= s3
+            s2 ^= t;  s3[:] = _rotl(s3, 45)
+        return out.reshape(-1)
+
+    def words(self, n: int, out: np.ndarray | None = None) -> np.ndarray:
+        """Next ``n`` raw 64-bit words of the stream (into ``out`` if given)."""
+        out  = np.empty(n, dtype=np.uint64) if out is None else out
+        have = min(n, self._pool.size - self._pos)
+        out[:have] = self._pool[self._pos:self._pos + have]
+        self._pos += have
+        if have < n:
+            need       = n - have
+            self._pool = self._refill(-(-need // self.LANES))
+            out[have:] = self._pool[:need]
+            self._pos  = need
         return out
 
+    def rand(self, n: int, out: np.ndarray | None = None) -> np.ndarray:
+        """``n`` uniform doubles in [0, 1): the top 53 bits of each word · 2**-53.
+
+        With ``out`` the words are drawn into its own storage and converted in
+        place, so no temporaries are allocated.
+        """
+        out = np.empty(n, dtype=np.float64) if out is None else out
+        w   = self.words(n, out.view(np.uint64))
+        w >>= _U(11)
+        return np.multiply(w, 2**-53, out=out)
+
     def randint(self, high: int, size: int) -> np.ndarray:
-        lim  = np.uint64(high)
-        out  = np.empty(size, dtype=np.uint64)
-        for i in range(size):
-            limit = ((1 << 64) // lim) * lim
-            while True:
-                r = self._next()
-                if r < limit:
-                    out[i] = r % lim
-                    break
-        return out
+        """``size`` uniform integers in [0, high), unbiased by rejection.
+
+        A word ``r`` is accepted if ``r < (2**64 // high) * high``; rejected
+        positions are redrawn from the following words in index order.
+        """
+        out   = self.words(size)
+        limit = ((1 << 64) // high) * high
+        if limit <= M64:
+            bad = np.flatnonzero(out >= _U(limit))
+            while bad.size:
+                out[bad] = self.words(bad.size)
+                bad      = bad[out[bad] >= _U(limit)]
+        return out % _U(high)
 
     def shuffle(self, a: np.ndarray):
-        for i in range(len(a) - 1, 0, -1):
-            lim   = i + 1
-            limit = ((1 << 64) // lim) * lim
-            while True:
-                r = self._next()
-                if r < limit:
-                    j = r % lim
-                    a[i], a[j] = a[j], a[i]
-                    break
+        """Shuffle ``a`` in place by the stable argsort of ``len(a)`` words
+        (radix-sorted when long, which yields the same permutation)."""
+        if len(a) > 1:
+            w = self.words(len(a))
+            a[:] = a[_radix_order([w]) if len(a) >= RADIX_MIN else np.argsort(w, kind="stable")]
 
 # ────────────────────── dtypes ────────────────────────────
 F64   = np.dtype("float64")
@@ -96,12 +161,112 @@ REC_F = np.dtype([("val", F64), ("key", "<u8"), ("tie", F64), ("seq", "<u8")])
 REC_I = np.dtype([("val", F64), ("key", "<u8"), ("tie", "<u8"), ("seq", "<u8")])
 assert REC_F.itemsize == REC_I.itemsize == 32, "ABI drift detected"
 
+# Run file v1: [records][footer][BLAKE3-128 of records ‖ footer].  Records hold
+# the key, plus the tie for random tie-breaks and the value in CURVED mode
+# (where the key is not invertible); seq is implied by run order.  Key-only
+# runs of few distinct keys store one (key, count) record per key instead.
+RUN_MAGIC, RUN_VERSION = b"XSRUN", 1
+F_TIE, F_VAL, F_CNT    = 1, 2, 4
+_FOOT                  = struct.Struct("<5sBBxQ")             # magic, version, flags, count
+
+def _run_dtype(flags: int) -> np.dtype:
+    return np.dtype([("key", "<u8")] + [("tie", F64)] * bool(flags & F_TIE) + [("val", F64)] * bool(flags & F_VAL)
+                    + [("cnt", "<u8")] * bool(flags & F_CNT))
+
+def _rec_flags(dtype: np.dtype) -> int:
+    """Run format flags of record ``dtype`` (inverse of :func:`_run_dtype`)."""
+    return F_TIE * ("tie" in dtype.names) | F_VAL * ("val" in dtype.names) | F_CNT * ("cnt" in dtype.names)
+
 # ────────────────────── helpers ───────────────────────────
-WIN0        = 256 * 1024 * 1024
+RUN_WIN     = 4 * 1024 * 1024                # default read window per open run, bytes
+WRITE_BUF   = 1 << 20                       # write buffer per scratch file, bytes
+TAIL_MEM    = 512 * 1024 * 1024             # most NaN/inf tail bytes shuffled in memory at once
+_FADVISE    = hasattr(os, "posix_fadvise")
+MERGE_BLK   = 1 << 15                       # records pulled per run and merge round
+PAR_SEG     = 1 << 22                       # most records per range of the parallel merge
+MIN_CHUNK   = 1 << 12                       # smallest automatic chunk, values
+DEF_CHUNK   = 1 << 18                       # chunk when sizes must not follow free RAM, values
+IN_BUF      = 1 << 18                       # input rebatch buffer kept between sorts, values
+RSEL_SPLIT  = 8                             # input blocks per chunk under replacement selection
+NEAR_SHIFT  = 10                            # ≤ n >> NEAR_SHIFT descents: chunk is nearly sorted
+RADIX_BITS  = 16                            # digit width of the LSD radix sort
+RADIX_MIN   = 1 << 12                       # shortest chunk SortKernel.AUTO radix-sorts
+RLE_RATIO   = 0.25                          # most distinct keys per value for a (key, count) run
 _auto_seed  = lambda: int.from_bytes(os.urandom(8), "little") ^ (os.getpid() << 16) ^ time.time_ns()
 _det_name   = lambda wd, i: os.path.join(wd, f"c_{i:012d}")
 
+def _flat(x) -> np.ndarray:
+    """Flat array over an ndarray, ``array.array``, memoryview or raw float64
+    buffer, in its own dtype."""
+    if isinstance(x, (bytes, bytearray)) or (isinstance(x, memoryview) and x.format in ("B", "b", "c")):
+        return np.frombuffer(x, dtype=F64)
+    return np.asarray(x).reshape(-1)
+
+def _as_f64(x, n: int) -> Generator[np.ndarray, None, None]:
+    """``x`` as flat float64 arrays: whole if it already is float64, else
+    converted ``n`` values at a time, so a float32 memmap is never copied
+    whole."""
+    a = _flat(x)
+    if a.dtype == F64:
+        yield a
+        return
+    for o in range(0, a.size, n):
+        yield a[o:o + n].astype(F64)
+
+def _pieces(itr, n: int) -> Generator[np.ndarray, None, None]:
+    """Bulk views of ``itr``: buffers pass through as by :func:`_as_f64`,
+    element iterables go through ``np.fromiter`` ``n`` values at a time."""
+    if isinstance(itr, (np.ndarray, memoryview, array.array, bytes, bytearray)):
+        yield from _as_f64(itr, n)
+        return
+    left = len(itr) if hasattr(itr, "__len__") else -1
+    it   = iter(itr)
+    while left:
+        a = np.fromiter(itertools.islice(it, n), dtype=F64, count=-1 if left < 0 else min(n, left))
+        if not a.size:
+            return
+        left = left - a.size if left > 0 else left
+        yield a
+
+def _rebatch(src: Iterable[np.ndarray], n: int, buf: np.ndarray | None = None) -> Generator[np.ndarray, None, None]:
+    """Regroup value arrays into contiguous float64 blocks of ``n`` values.
+
+    With ``buf`` every block is a view refilled in place, otherwise each block
+    is a fresh array the caller may keep.
+    """
+    out, fill = (np.empty(n, dtype=F64) if buf is None else buf[:n]), 0
+    for a in src:
+        while a.size:
+            take = min(n - fill, a.size)
+            out[fill:fill + take] = a[:take]
+            fill += take
+            a     = a[take:]
+            if fill == n:
+                yield out
+                out, fill = (np.empty(n, dtype=F64) if buf is None else out), 0
+    if fill:
+        yield out[:fill]
+
+def _drain(it: Iterable):
+    for _ in it:
+        pass
+
+def _nofile() -> int:
+    """Soft open-file limit, or 0 where it cannot be read."""
+    with contextlib.suppress(Exception):
+        import resource
+        lim = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+        return lim if lim > 0 else 0
+    return 0
+
+def _avail_ram() -> int:
+    """Bytes of RAM currently available, or 1 GiB where it cannot be read."""
+    with contextlib.suppress(Exception):
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    return 1 << 30
+
 def _dir_sync(p: str):
+    """fsync the directory holding ``p``, where the platform allows it."""
     with contextlib.suppress(Exception):
         d = os.path.dirname(p)
         if os.name == "posix" and hasattr(os, "O_DIRECTORY"):
@@ -111,19 +276,37 @@ def _dir_sync(p: str):
 # ────────────────────── public sorter ─────────────────────
 class Mode(Enum):      STRICT = "strict"; CURVED = "curved"
 class TieBreak(Enum):  VALUE  = "value";  INDEX  = "index"; RANDOM = "random"; SHUFFLE = "shuffle"
+class SortKernel(Enum): AUTO  = "auto";   RADIX  = "radix"; NUMPY  = "numpy"
+class Durability(Enum): NONE  = "none";   BATCH  = "batch"; STRICT = "strict"
+class Specials(Enum):   TAIL  = "tail";   INF    = "inf";   INLINE = "inline"
 
 class XiSort:
     __slots__ = ("mode","tie","rng","det","nan","max","disk","wd","idx","gseq",
-                 "integrity","soft","_maxseq","eps","dtype","buf")
+                 "integrity","soft","_maxseq","eps","rfmt","dtype","buf","win","vfirst","fan","io","depth","_io","workers","_cpu","_ws","mem","rsel","_rs","_rw","stats","kernel","sync","sync_every","_unsynced","specials","cnt","_wq")
 
     def __init__(self, *, mode=Mode.STRICT, epsilon=0.01,
                  tie_break=TieBreak.VALUE, seed: int | None = None,
                  require_deterministic=False, nan_shuffle=False,
                  max_gb=1.0, tmpdir: str | None = None,
-                 integrity=True, soft_verify=False):
+                 integrity=True, soft_verify=False, merge_window: int = RUN_WIN,
+                 verify_first=False, max_fan_in: int = 128,
+                 io_threads: int = 0, io_depth: int = 2, workers: int = 0,
+                 mem_limit: int | None = None, replacement_selection=False,
+                 sort_kernel=SortKernel.AUTO, durability=Durability.BATCH, sync_every: int = 16,
+                 specials=Specials.TAIL, count_specials=True):
 
         if epsilon * math.pi >= 1:
             raise ValueError("ε too large (π·ε must be < 1)")
+        if merge_window < 1:
+            raise ValueError("merge_window must be ≥ 1 byte")
+        if max_fan_in < 2:
+            raise ValueError("max_fan_in must be ≥ 2")
+        if io_threads < 0 or io_depth < 1 or workers < 0:
+            raise ValueError("io_threads and workers must be ≥ 0, io_depth ≥ 1")
+        if sync_every < 1:
+            raise ValueError("sync_every must be ≥ 1")
+        if mem_limit is not None and mem_limit < 1:
+            raise ValueError("mem_limit must be ≥ 1 byte")
         if require_deterministic and seed is None:
             raise ValueError("deterministic=True requires explicit seed")
         if seed is None:
@@ -135,10 +318,36 @@ class XiSort:
         self.wd                      = tempfile.mkdtemp(prefix="xisort_36_5_", dir=tmpdir)
         self.idx = self.gseq         = 0
         self.integrity, self.soft    = bool(integrity), bool(soft_verify)
+        self.vfirst                  = bool(verify_first)   # check every tag before the first value leaves
         self._maxseq                 = (1 << 64) - 1
         self.eps                     = float(epsilon)
-        self.dtype                   = REC_I if tie_break is TieBreak.VALUE else REC_F
-        self.buf                     = np.empty(2 ** 18, dtype=np.float64)
+        self.rfmt                    = (F_TIE if tie_break in (TieBreak.RANDOM, TieBreak.SHUFFLE) else 0) \
+                                       | (F_VAL if mode is Mode.CURVED else 0)
+        self.dtype                   = _run_dtype(self.rfmt)
+        self.buf                     = np.empty(IN_BUF, dtype=np.float64)
+        self.win                     = int(merge_window)
+        self.fan                     = int(max_fan_in)
+        self.io, self.depth, self._io = int(io_threads), int(io_depth), None
+        self.workers, self._cpu      = int(workers), None
+        self._ws: List[_Workspace]   = []                   # free run-formation workspaces
+        self.mem                     = None if mem_limit is None else int(mem_limit)   # None: half the free RAM
+        self.rsel                    = bool(replacement_selection)
+        self._rs = self._rw          = None
+        self._wq                     = None                 # last run write queued on the I/O pool
+        self.stats: dict             = {}                   # presortedness of the last sort, see _sort
+        self.kernel                  = SortKernel(sort_kernel)
+        # scratch durability: STRICT syncs the directory after every run, BATCH
+        # once per sync_every runs and when run formation ends, NONE never
+        self.sync, self.sync_every   = Durability(durability), int(sync_every)
+        self._unsynced               = 0
+        # where non-finite values go: TAIL sends NaN and ±inf to the tail after
+        # the merge; INF keys ±inf in the runs, below and above every finite
+        # value; INLINE also keys NaN in the runs (K_NAN, last) unless
+        # nan_shuffle asks for the shuffled tail.  A K_NAN key only restores
+        # the default NaN, so in STRICT mode NaNs with other payloads or the
+        # sign bit still take the tail, which keeps their bits
+        self.specials                = Specials(specials)
+        self.cnt                     = bool(count_specials)   # see _counted
 
     def _budget(self, delta: int):
         self.disk = max(self.disk + delta, 0)
@@ -146,78 +355,601 @@ class XiSort:
             raise MemoryError("ΞSort scratch quota exceeded")
 
     def _metric(self, a: np.ndarray) -> np.ndarray:
-        if self.mode is Mode.STRICT:
-            return a
-        lo, hi  = a.min(), a.max()
-        span    = hi - lo
-        norm    = np.zeros_like(a) if span <= np.finfo(a.dtype).tiny else (a - lo) / span
-        return norm + self.eps * np.cos(np.pi * norm)
-
-    def stream_sort(self, itr: Iterable[float], *, chunk_size: int = 2**18) -> Generator[float,None,None]:
+        return a if self.mode is Mode.STRICT else _curve(a, self.eps)
+
+    @property
+    def _inf_keys(self) -> bool:
+        return self.specials is not Specials.TAIL
+
+    @property
+    def _counted(self) -> bool:
+        """±inf, NaN (and ±0 in STRICT mode) leave run formation as counts per
+        class and NaN payload, unless nan_shuffle asks for a shuffled tail."""
+        return self.cnt and not self.nan
+
+    def _mem(self) -> int:
+        return self.mem if self.mem is not None else _avail_ram() // 2
+
+    @property
+    def _fixed(self) -> bool:
+        """Whether sizes must not follow free RAM: CURVED keys depend on the
+        chunking, and seeded output on chunk and tail bucket sizes.  An
+        explicit ``mem_limit`` is deterministic and still sizes them."""
+        return self.mem is None and (self.mode is Mode.CURVED or self.det)
+
+    def _tail_mem(self) -> int:
+        return TAIL_MEM if self._fixed else min(TAIL_MEM, self._mem())
+
+    def _chunk(self, chunk_size: int | None, hint: int) -> int:
+        """Values per chunk: ``chunk_size`` if given, else sized from ``mem_limit``.
+
+        Each value costs 8 bytes of input buffer plus one workspace and sort
+        permutation per chunk in flight (``workers + io_depth + 1`` with pools,
+        else one), and a run must fit in half of ``max_gb``.  When ``hint``
+        values fit in memory at once the chunk holds them all, so no run is
+        written.  Without ``mem_limit``, CURVED and ``require_deterministic``
+        sorts take ``DEF_CHUNK`` instead (see :attr:`_fixed`).
+
+        With ``workers`` the chunk is split ``workers`` ways, so the runs of an
+        input that fits, or of one memory's worth, form in parallel.  Only
+        STRICT sorts not bound to a seed split: their output does not depend on
+        the chunking.
+        """
+        if chunk_size is not None:
+            if chunk_size < 1:
+                raise ValueError("chunk_size must be ≥ 1")
+            return int(chunk_size)
+        if self._fixed:
+            return DEF_CHUNK
+        mem  = self._mem()
+        per  = _Workspace.width(self.rfmt) + 8
+        live = self.workers + self.depth + 1 if self.workers or self.io else 1
+        ways = self.workers if self.workers and self.mode is Mode.STRICT and not self.det else 1
+        if 0 < hint and hint * (8 + per) <= mem:
+            return max(-(-hint // ways), min(hint, MIN_CHUNK))
+        n = min(mem // (8 + live * per), self.max // (2 * self.dtype.itemsize))
+        return max(-(-n // ways), MIN_CHUNK)
+
+    def _topk_chunk(self, chunk_size: int | None, hint: int) -> int:
+        """Values per chunk of :meth:`topk`: as :meth:`_chunk`, but sized from
+        what :meth:`_select_k` holds per value rather than a run workspace.
+        That is the input buffer, mask and filtered values, the (key, [tie,]
+        seq, val) record, one key/tie/seq temporary, and the partition copy and
+        mask of ``_best_k``; no pools are in flight and no run must fit on disk."""
+        if chunk_size is not None or self._fixed:
+            return self._chunk(chunk_size, hint)
+        rec = 8 * (4 if self.rfmt & F_TIE else 3)
+        n   = max(self._mem() // (8 + 1 + 8 + rec + 8 + 8 + 1), MIN_CHUNK)
+        return min(n, hint) if hint > 0 else n
+
+    def _step(self, chunk_size: int) -> int:
+        """Values keyed together: a chunk, or an ``RSEL_SPLIT``-th of one under
+        replacement selection.  CURVED keys are normalised over the values
+        keyed together, so CURVED sorts always key whole chunks and match the
+        sort without replacement selection."""
+        return max(chunk_size // RSEL_SPLIT, 1) if self.rsel and self.mode is Mode.STRICT else chunk_size
+
+    def _fan_in(self, merge: bool = True) -> int:
+        """Runs merged at once: ``max_fan_in``, capped to half the open-file
+        limit and, for a merge, to the read windows (two each when prefetched)
+        that fit in memory.  Tail buckets need no window: ``merge=False``."""
+        lim = _nofile()
+        fan = min(self.fan, lim // 2) if lim else self.fan
+        if merge:
+            fan = min(fan, self._mem() // (self.win * (2 if self._io else 1)))
+        return max(2, fan)
+
+    def _merge_runs(self, paths: List[str], integrity: bool) -> Generator[np.ndarray, None, None]:
+        """Merged records of ``paths``; (key, count) records with equal keys
+        combined if any run is counted."""
+        order = ("key", "tie") if self.rfmt & F_TIE else ("key",)
+        if self._io is None:
+            srcs = [_reader(p, integrity, self.soft, self.win) for p in paths]
+        else:   # two buffers per run: one held by the merge, one being prefetched
+            srcs = [_prefetch(_reader(p, integrity, self.soft, self.win, nbuf=2), self._io) for p in paths]
+        if not _has_counts(paths, self.soft):
+            return _merge([_slices(r, MERGE_BLK) for r in srcs], order)
+        srcs = [map(_with_counts, r) for r in srcs]
+        return map(_collapse, _merge([_slices(r, MERGE_BLK) for r in srcs], order))
+
+    def _merge_parallel(self, paths: List[str]) -> Generator[np.ndarray, None, None]:
+        """Final merge split into key ranges that the worker pool merges at once.
+
+        Every run is sampled at a fixed stride; every 8th of the sorted samples
+        becomes a splitter, ordered by (key, tie, run, position) so that even a
+        single repeated key splits cleanly.  Each run's boundary for a splitter
+        is bisected on its mmap, ranges are merged into preallocated value
+        segments (at most ``2 × workers`` in flight) and yielded in range
+        order, which reproduces the sequential merge exactly.  A run's slices
+        are consecutive across ranges, so each is hashed from the mmap once
+        its range has been taken, one range behind on the pool; tags are
+        checked after the last range, before the stream ends.
+        """
+        order = ("key", "tie") if self.rfmt & F_TIE else ("key",)
+        maps  = [_map_run(p, self.soft) for p in paths]
+        mms   = [mm for mm, _, _ in maps]
+        views = [v for _, v, _ in maps]
+        hs    = [blake3.blake3() if self.integrity and not self.vfirst and info is not None else None
+                 for _, _, info in maps]
+
+        total  = sum(len(v) for v in views)
+        seg    = min(PAR_SEG, max(MERGE_BLK, total // (4 * self.workers)))
+        stride = max(1, seg // 8)
+        at     = [np.arange(stride - 1, len(v), stride) for v in views]
+        cols   = [np.concatenate([v[f][a] for v, a in zip(views, at)]) for f in order]
+        run    = np.concatenate([np.full(len(a), i) for i, a in enumerate(at)])
+        pos    = np.concatenate(at)
+        pick   = np.lexsort([pos, run] + cols[::-1])[7::8]
+
+        bounds = [[0] * len(views)]
+        for j in pick:
+            c, ci, cp = {f: col[j] for f, col in zip(order, cols)}, run[j], pos[j]
+            bounds.append([int(cp) if i == ci else _bisect_upto(v, c, order, "right" if i < ci else "left")
+                           for i, v in enumerate(views)])
+        bounds.append([len(v) for v in views])
+
+        pool   = self._cpu
+        ranges = iter(range(len(bounds) - 1))
+        submit = lambda r: pool.submit(_merge_range, [v[lo:hi] for v, lo, hi in zip(views, bounds[r], bounds[r + 1])],
+                                       order, self.rfmt)
+        live   = deque(submit(r) for r in itertools.islice(ranges, 2 * self.workers))
+        hashed = None       # hashing of the last range taken, kept in range order
+
+        def digest(r: int):
+            for h, v, lo, hi in zip(hs, views, bounds[r], bounds[r + 1]):
+                if h is not None and hi > lo:
+                    h.update(v[lo:hi].view(np.uint8))
+        try:
+            for r in range(len(bounds) - 1):
+                out = live.popleft().result()
+                live.extend(submit(q) for q in itertools.islice(ranges, 1))
+                if any(h is not None for h in hs):
+                    if hashed is not None:
+                        hashed.result()
+                    hashed = (self._io or pool).submit(digest, r)
+                yield out
+            if hashed is not None:
+                hashed.result()
+            for p, h, (_, _, info) in zip(paths, hs, maps):
+                if h is not None:
+                    h.update(info[2])
+                    if not hmac.compare_digest(h.digest(length=16), info[3]):
+                        msg = f"Integrity check failed (tag mismatch) in {os.path.basename(p)}"
+                        if self.soft:
+                            warnings.warn(msg)
+                        else:
+                            raise IOError(msg)
+        finally:
+            for f in itertools.chain(live, () if hashed is None else (hashed,)):
+                f.cancel()
+                with contextlib.suppress(Exception):
+                    f.result()
+            live.clear(); views.clear(); maps.clear(); submit = digest = None
+            for mm in mms:
+                if mm is not None:
+                    with contextlib.suppress(BufferError):
+                        mm.close()
+
+    def _workspace(self, n: int, pending: deque, chunks: List[str]) -> _Workspace:
+        """A free workspace for chunks of up to ``n`` values.
+
+        At most ``workers + io_depth`` chunks are in flight, each holding its
+        workspace; past that the oldest is waited for and its workspace reused,
+        so ``workers + io_depth + 1`` workspaces exist at most.
+        """
+        if self._cpu is not None or self._io is not None:
+            while len(pending) >= self.depth + self.workers:
+                self._retire(pending, chunks)
+        ws = self._ws.pop() if self._ws else None
+        return ws if ws is not None and len(ws.vals) >= n else _Workspace(n, self.rfmt)
+
+    def _retire(self, pending: deque, chunks: List[str]):
+        """Finish the oldest chunk in flight: a run built by a worker is
+        written here, in chunk order, like a serial one; a queued write is
+        waited for.  Its workspace is free after that."""
+        fut, ws = pending.popleft()
+        rec = fut.result()
+        if rec is not None:
+            self._extend(chunks, rec)
+        self._done(ws)
+
+    def _synced(self, final: bool = False):
+        """Note one more finished scratch file (none if ``final``) under BATCH
+        durability, syncing the directory every ``sync_every`` files and on
+        ``final``.  STRICT files are synced as they are written."""
+        if self.sync is not Durability.BATCH:
+            return
+        self._unsynced += not final
+        if self._unsynced and (final or self._unsynced >= self.sync_every):
+            _dir_sync(_det_name(self.wd, 0))
+            self._unsynced = 0
+
+    def _done(self, ws: _Workspace):
+        """Count the shape of the run just built in ``ws`` and free it."""
+        self.stats["chunks"] += 1
+        if ws.shape != "random":
+            self.stats[ws.shape] += 1
+        self.stats["counted"] += ws.counted
+        self._free(ws)
+
+    def _free(self, ws: _Workspace):
+        """Return ``ws`` to the free list, which holds at most the
+        ``workers + io_depth + 1`` workspaces a sort can have in flight."""
+        if len(self._ws) < (self.workers + self.depth + 1 if self.workers or self.io else 1):
+            self._ws.append(ws)
+
+    def _release(self):
+        """Drop the workspaces and the grown input buffer once a sort ends, so
+        an idle sorter holds no chunk-sized memory."""
+        self._ws.clear()
+        if self.buf.size > IN_BUF:
+            self.buf = np.empty(IN_BUF, dtype=np.float64)
+
+    def _spill(self, chunks: List[str], ws: _Workspace, n: int, tie: np.ndarray | None, pending: deque):
+        """Turn the ``n`` values in ``ws`` into the next run of ``chunks``, on a
+        pool when one is configured.
+
+        With ``workers`` the run (keys, sort) is built on the worker pool and
+        written by :meth:`_retire`; with only ``io_threads`` it is built here
+        and its writes queued on the I/O pool.  Either way :meth:`_extend`
+        sees the runs in chunk order, so run files are the serial ones.  ``ws``
+        stays with the chunk until its run is written.  Under replacement
+        selection the chunk goes to :meth:`_select` instead.
+        """
+        if self._rs is not None:
+            return self._select(chunks, ws, n, tie)
+        eps = self.eps if self.mode is Mode.CURVED else None
+        rle = not self.rfmt                          # equal keys are equal values: count them
+        if self._cpu is not None:
+            pending.append((self._cpu.submit(_build_run, ws, n, tie, self.rfmt, eps, self.kernel,
+                                             self._inf_keys, rle), ws))
+            return
+        self._extend(chunks, _build_run(ws, n, tie, self.rfmt, eps, self.kernel, self._inf_keys, rle))
+        if self._wq is not None:
+            pending.append((self._wq, ws))
+        else:
+            self._done(ws)
+
+    def _extend(self, chunks: List[str], rec: np.ndarray):
+        """Write sorted ``rec`` as a run, appended to the open one when it
+        starts at or after that run's last record (a natural run) in the
+        same format."""
+        order = ("key", "tie") if self.rfmt & F_TIE else ("key",)
+        if self._rw is not None and (self._rw.flags != _rec_flags(rec.dtype)
+                                     or _upto(rec[:1], self._rw.last, order, side="left")):
+            self._emit(chunks, [None])
+        elif self._rw is not None:
+            self.stats["concatenated"] += 1
+        self._emit(chunks, [rec])
+
+    def _select(self, chunks: List[str], ws: _Workspace, n: int, tie: np.ndarray | None):
+        """Push one chunk through replacement selection and write what leaves it.
+
+        Runs are written as they grow, from here or queued on the I/O pool;
+        scratch is accounted per block.
+        """
+        eps = self.eps if self.mode is Mode.CURVED else None
+        blk = _build_run(ws, n, tie, self.rfmt, eps, self.kernel, self._inf_keys).copy()
+        self._done(ws)
+        self._emit(chunks, self._rs.push(blk))
+
+    def _emit(self, chunks: List[str], out: list):
+        for rec in out:
+            if rec is None:
+                self._write(self._seal, self._rw)
+                self._synced()
+                self._budget(_FOOT.size + 16)
+                self._rw = None
+                continue
+            if self._rw is None:
+                self._rw = _RunWriter(_det_name(self.wd, self.idx), _rec_flags(rec.dtype))
+                chunks.append(self._rw.path)
+                self.idx += 1
+            self._write(self._rw.put, self._rw.note(rec))
+            self._budget(rec.nbytes)
+
+    def _write(self, fn, arg):
+        """``fn(arg)`` here, or queued on the I/O pool behind the previous
+        write when only ``io_threads`` are set, so runs are written in order."""
+        if self._io is None or self._cpu is not None:
+            return fn(arg)
+        prev = self._wq
+        def job():
+            if prev is not None:
+                prev.result()
+            fn(arg)
+        self._wq = self._io.submit(job)
+
+    def _seal(self, w: _RunWriter):
+        w.close()
+        if self.sync is Durability.STRICT:
+            _dir_sync(w.path)
+
+    def _cascade(self, runs: List[str]):
+        """Merge ``runs`` in place, in passes, until one final merge can take them all.
+
+        With R runs and fan-in F, a pass count p = ⌈log_F R⌉ is planned and each
+        pass merges consecutive groups of k = ⌈R^(1/p)⌉ runs, so every record is
+        rewritten the same number of times.  Groups stay consecutive to keep the
+        run-order tie-break.  A group's output is written before its inputs are
+        removed, so k also shrinks until one group fits the remaining ``max_gb``.
+        """
+        fan = self._fan_in()
+        while len(runs) > fan:
+            r, p = len(runs), 1
+            while fan ** p < r:
+                p += 1
+            k = math.ceil(r ** (1 / p))
+            while k ** p < r:
+                k += 1
+            avg = sum(os.path.getsize(q) for q in runs) / r
+            k   = max(2, min(k, int((self.max - self.disk) // max(avg, 1))))
+
+            done: List[str] = []
+            for grp in [runs[g:g + k] for g in range(0, r, k)]:
+                if len(grp) == 1:
+                    done.extend(grp)
+                    continue
+                out = _det_name(self.wd, self.idx)
+                self.idx += 1
+                runs.append(out)                          # visible to cleanup while written
+                flags = self.rfmt | (F_CNT if _has_counts(grp, self.soft) else 0)
+                self._budget(_store_run(out, self._merge_runs(grp, self.integrity), flags, self.sync))
+                self._synced()
+                for q in grp:
+                    size = os.path.getsize(q)
+                    os.remove(q)
+                    runs.remove(q)
+                    self._budget(-size)
+                done.append(out)
+            runs[:] = done
+
+    def stream_sort(self, itr: Iterable[float], *, chunk_size: int | None = None,
+                    size_hint: int | None = None) -> Generator[float,None,None]:
+        """Sorted values of ``itr``.
+
+        ``chunk_size`` values are sorted per run; by default it is sized from
+        ``mem_limit`` and ``size_hint`` (``len(itr)`` when known), and an input
+        that fits in memory is sorted without writing runs.  CURVED and
+        ``require_deterministic`` sorts without ``mem_limit`` keep a fixed
+        ``DEF_CHUNK``, so their output does not depend on free RAM.
+        """
+        with contextlib.closing(self.stream_sort_blocks(itr, chunk_size=chunk_size, size_hint=size_hint)) as blocks:
+            for blk in blocks:
+                yield from blk
+
+    def stream_sort_blocks(self, itr: Iterable[float], *, chunk_size: int | None = None,
+                           block_size: int = 2**16, size_hint: int | None = None,
+                           limit: int | None = None) -> Generator[np.ndarray,None,None]:
+        """Same order as :meth:`stream_sort`, as contiguous float64 arrays of
+        ``block_size`` values (only the last block may be shorter).  With
+        ``limit`` only the first ``limit`` values, found as by :meth:`topk`."""
+        pieces, chunk = self._input(itr, chunk_size, size_hint, topk=limit is not None)
+        return self._sort(pieces, chunk, block_size, limit)
+
+    def sort_arrays(self, chunks: Iterable, *, chunk_size: int | None = None,
+                    block_size: int = 2**16, size_hint: int | None = None,
+                    limit: int | None = None) -> Generator[np.ndarray,None,None]:
+        """Sort an iterable of array chunks (ndarray, ``array.array``,
+        memoryview or any float64 buffer); yields blocks like
+        :meth:`stream_sort_blocks`.  ``size_hint`` is the total value count,
+        if known."""
+        chunk = (self._chunk if limit is None else self._topk_chunk)(chunk_size, size_hint or 0)
+        return self._sort(itertools.chain.from_iterable(_as_f64(c, chunk) for c in chunks),
+                          chunk, block_size, limit)
+
+    def topk(self, itr: Iterable[float], k: int, largest: bool = False, *,
+             chunk_size: int | None = None, size_hint: int | None = None) -> np.ndarray:
+        """The ``k`` values :meth:`stream_sort` yields first (last if
+        ``largest``), in sorted order, without writing runs.
+
+        Chunks are keyed and tied as for the full sort and each is cut to its
+        ``k`` best records by ``np.partition`` over the key (records equal to
+        the cut key included, then ordered by tie and position); survivors
+        join the ``k`` kept so far, so memory is one chunk plus O(k).  NaN and
+        ±inf are counted as without ``nan_shuffle``, since a shuffled tail has
+        no O(k) form.
+        """
+        pieces, chunk = self._input(itr, chunk_size, size_hint, topk=True)
+        return self._topk(pieces, chunk, k, largest)
+
+    def _input(self, itr: Iterable[float], chunk_size: int | None, size_hint: int | None,
+               topk: bool = False) -> tuple:
+        """(value arrays, chunk size) for an element iterable or a buffer."""
+        if isinstance(itr, (np.ndarray, memoryview, array.array, bytes, bytearray)):
+            itr = _flat(itr)
+        hint  = operator.length_hint(itr, 0) if size_hint is None else size_hint
+        chunk = (self._topk_chunk if topk else self._chunk)(chunk_size, hint)
+        return _pieces(itr, chunk), chunk
+
+    def _topk(self, pieces: Iterable[np.ndarray], chunk_size: int, k: int, largest: bool) -> np.ndarray:
+        self._new_stats()
+        try:
+            return self._select_k(pieces, chunk_size, k, largest)
+        finally:
+            self._release()
+            with contextlib.suppress(OSError):
+                os.rmdir(self.wd)                # no runs: the scratch directory is still empty
+
+    def _select_k(self, pieces: Iterable[np.ndarray], chunk_size: int, k: int, largest: bool) -> np.ndarray:
+        if k < 0:
+            raise ValueError("k must be ≥ 0")
+        if not k:
+            return np.empty(0, dtype=F64)
+        if chunk_size > self.buf.size:
+            self.buf = np.empty(chunk_size, dtype=np.float64)
+        eps    = self.eps if self.mode is Mode.CURVED else None
+        order  = ("key", "tie", "seq") if self.rfmt & F_TIE else ("key", "seq")
+        dtype  = np.dtype([(f, F64 if f == "tie" else "<u8") for f in order] + [("val", F64)])
+        best   = np.empty(0, dtype=dtype)
+        counts = _Counts()
+        seq    = 0
+        # the same blocks, ties and keys as _sort, so the k kept are the full sort's
+        step   = self._step(chunk_size)
+        for arr in _rebatch(pieces, step, self.buf):
+            ok = np.isfinite(arr)
+            if eps is None:
+                ok &= arr != 0.0
+            vals = arr if ok.all() else arr[ok]
+            if len(vals) < len(arr):
+                counts.add(arr[~ok])
+            n = len(vals)
+            if not n:
+                continue
+            self.stats["chunks"] += 1
+            rec        = np.empty(n, dtype=dtype)
+            rec["val"] = vals
+            rec["key"] = ieee_key(vals if eps is None else _curve(vals, eps))
+            rec["seq"] = np.arange(seq, seq + n, dtype=np.uint64)
+            if self.rfmt & F_TIE:
+                rec["tie"] = self.rng.rand(n)
+            seq += n
+            best = _best_k(np.concatenate((best, _best_k(rec, k, order, largest))), k, order, largest)
+
+        head, rest = counts.blocks(self._inf_keys)
+        blocks     = head + [best["val"]] + rest
+        out, left  = [], k
+        for b in (reversed(blocks) if largest else blocks):
+            b = b[len(b) - min(left, len(b)):] if largest else b[:left]
+            out.append(b)
+            left -= len(b)
+            if not left:
+                break
+        return np.concatenate(out[::-1] if largest else out)
+
+    def _new_stats(self):
+        self.stats = dict.fromkeys(("chunks", "ascending", "descending", "nearly", "concatenated", "counted"), 0)
+
+    def _sort(self, pieces: Iterable[np.ndarray], chunk_size: int, block_size: int,
+              limit: int | None = None) -> Generator[np.ndarray,None,None]:
+        """Shared body of the public sorts.
+
+        ``self.stats`` counts, for this sort, the ``chunks`` turned into
+        sorted records and how many were already ``ascending``, strictly
+        ``descending`` or ``nearly`` sorted (and cheaper to sort), plus the
+        chunks ``concatenated`` onto the previous run or records because they
+        continued it in order, and the runs written ``counted`` as (key, count)
+        records.  Under ``limit`` no runs are formed and only ``chunks`` is
+        counted, as by :meth:`topk`.
+        """
+        if block_size < 1:
+            raise ValueError("block_size must be ≥ 1")
+        if limit is not None:
+            yield from _rebatch((self._topk(pieces, chunk_size, limit, False),), block_size)
+            return
+        self._new_stats()
         if chunk_size > self.buf.size:
             self.buf = np.empty(chunk_size, dtype=np.float64)
 
         chunks: List[str] = []
         tail_tmp = tail_fin = None
         h_tail   = blake3.blake3()
-        it       = iter(itr)
+        pending: deque = deque()
+        held     = []       # chunks (ws, n, tie) kept in memory; None once runs are spilled
+        tails    = []       # NaN/inf tail pieces not yet written
+        counts   = _Counts()  # specials kept as counts instead (see _counted)
+        eps      = self.eps if self.mode is Mode.CURVED else None
+        # what may stay in memory: mem_limit, and at least the first chunk
+        room     = max(self._mem(), chunk_size * (8 + _Workspace.width(self.rfmt)))
+        # replacement selection keeps chunk_size records and takes input in smaller blocks
+        step     = self._step(chunk_size)
+        self._rs = _Replacer(chunk_size, ("key", "tie") if self.rfmt & F_TIE else ("key",), self.dtype) \
+                   if self.rsel else None
+        used     = 0
+        self._io  = ThreadPoolExecutor(self.io, thread_name_prefix="xisort-io") if self.io else None
+        self._cpu = ThreadPoolExecutor(self.workers, thread_name_prefix="xisort-run") if self.workers else None
 
         try:
-            while True:
-                i = 0
-                try:
-                    while i < chunk_size:
-                        self.buf[i] = next(it)
-                        i += 1
-                except StopIteration:
-                    pass
-                if i == 0:
-                    break
-
-                arr   = self.buf[:i]
-                mask  = np.isnan(arr) | np.isinf(arr)
-                finite = arr[~mask]
-
-                if mask.any():
-                    tail_tmp = tail_tmp or os.path.join(self.wd, "tail.tmp")
-                    tail     = arr[mask].copy()
+            for arr in _rebatch(pieces, step, self.buf):
+                ws = self._workspace(step, pending, chunks)
+                ok = ws.ok[:len(arr)]
+                if self._counted:
+                    np.isfinite(arr, out=ok)
+                    if eps is None:
+                        ok &= arr != 0.0                         # zeros have sentinel keys: count them too
+                elif self.specials is Specials.INLINE and not self.nan:
+                    if eps is None and np.isnan(arr, out=ok).any():
+                        nan     = np.flatnonzero(ok)             # only the default NaN survives a bare key
+                        ok[nan] = arr[nan].view(np.uint64) != _QNAN
+                        np.logical_not(ok, out=ok)
+                    else:
+                        ok = None                                # every value is keyed in the runs
+                elif self.specials is Specials.TAIL:
+                    np.isfinite(arr, out=ok)
+                else:
+                    np.logical_not(np.isnan(arr, out=ok), out=ok)
+                n = len(arr) if ok is None else int(np.count_nonzero(ok))
+                if n == len(arr):
+                    ws.vals[:n] = arr
+                elif self._counted:
+                    np.compress(ok, arr, out=ws.vals[:n])
+                    counts.add(arr[~ok])
+                else:
+                    np.compress(ok, arr, out=ws.vals[:n])
+                    tail = arr[~ok]
                     if self.nan:
                         self.rng.shuffle(tail)
-                    raw = tail.tobytes()
-                    h_tail.update(raw)
-                    with open(tail_tmp, "ab", 0) as fh:
-                        fh.write(raw)
-                    self._budget(len(raw))
+                    tails.append(tail)
+                    used += tail.nbytes
 
-                if not finite.size:
-                    continue
-                if self.gseq + len(finite) > self._maxseq:
-                    raise OverflowError("sequence counter exhausted")
-
-                key = ieee_key(self._metric(finite))
-                if   self.tie is TieBreak.VALUE:
-                    tie = key
-                elif self.tie is TieBreak.INDEX:
-                    tie = np.arange(len(finite), dtype=np.uint64) + self.gseq
-                else: # TieBreak.RANDOM or TieBreak.SHUFFLE (SHUFFLE handled by nan_shuffle for NaNs, random for finites)
-                    tie = self.rng.rand(len(finite)) # For finites, tie-breaking is random if not VALUE or INDEX
-
-                seq = np.arange(len(finite), dtype=np.uint64) + self.gseq
-                self.gseq += len(finite)
-
-                rec = np.empty(len(finite), dtype=self.dtype)
-                rec["val"], rec["key"], rec["tie"], rec["seq"] = finite, key, tie, seq
-                rec.sort(order=("key", "tie", "seq"))
-
-                fname = _det_name(self.wd, self.idx)
-                with open(fname, "wb", 0) as fh:
-                    buf_data = rec.tobytes()
-                    fh.write(buf_data)
-                    fh.write(blake3.blake3(buf_data).digest(length=16))
-                _dir_sync(fname)
-                self._budget(os.path.getsize(fname))
-                chunks.append(fname)
-                self.idx += 1
+                if n:
+                    if self.gseq + n > self._maxseq:
+                        raise OverflowError("sequence counter exhausted")
+                    # ties and names are drawn here, in chunk order, so runs do not
+                    # depend on how many workers build them
+                    tie = self.rng.rand(n, out=ws.tie[:n]) if self.rfmt & F_TIE else None # RANDOM / SHUFFLE
+                    self.gseq += n
+                    if held is None:
+                        self._spill(chunks, ws, n, tie, pending)
+                    else:
+                        held.append((ws, n, tie))
+                        used += len(ws.vals) * _Workspace.width(self.rfmt)
+                else:
+                    self._free(ws)
+
+                if held is not None and used > room:      # no longer fits: spill what is held
+                    os.makedirs(self.wd, exist_ok=True)   # an earlier sort may have removed it
+                    for h in held:
+                        self._spill(chunks, *h, pending)
+                    held = None
+                if held is None and tails:
+                    tail_tmp = tail_tmp or os.path.join(self.wd, "tail.tmp")
+                    with open(tail_tmp, "ab", WRITE_BUF) as fh:
+                        for tail in tails:
+                            raw = tail.tobytes()
+                            h_tail.update(raw)
+                            fh.write(raw)
+                            self._budget(len(raw))
+                    tails.clear()
+
+            if held is not None:
+                # everything fit: merge the chunks in memory, no files, tags or I/O
+                build  = lambda h: _build_run(*h, self.rfmt, eps, self.kernel, self._inf_keys)
+                recs   = list(self._cpu.map(build, held) if self._cpu and len(held) > 1 else map(build, held))
+                order  = ("key", "tie") if self.rfmt & F_TIE else ("key",)
+                # chunks that each continue the previous one in order need no merge
+                if all(not _upto(b[:1], a[-1], order, side="left") for a, b in zip(recs, recs[1:])):
+                    self.stats["concatenated"] += len(recs) - 1
+                    merged = (_values(r, self.rfmt) for r in recs)
+                else:
+                    merged = (_values(blk, self.rfmt) for blk in _merge([_slices((r,), MERGE_BLK) for r in recs], order))
+                tail   = np.concatenate(tails) if tails else None
+                if tail is not None:
+                    self.rng.shuffle(tail)
+                head, rest = counts.blocks(self._inf_keys)
+                yield from _rebatch(itertools.chain(head, merged, rest, () if tail is None else (tail,)), block_size)
+                for h in held:
+                    self._done(h[0])
+                return
+
+            while pending:
+                self._retire(pending, chunks)
+            if self._rs is not None:
+                self._emit(chunks, self._rs.close())
+            if self._rw is not None:
+                self._emit(chunks, [None])
+            if self._wq is not None:
+                self._wq.result()
 
             if tail_tmp:
                 tag = h_tail.digest(length=16)
@@ -225,20 +957,41 @@ class XiSort:
                     fh.write(tag)
                 tail_fin = os.path.join(self.wd, "tail.fin")
                 os.rename(tail_tmp, tail_fin)
-                _dir_sync(tail_fin)
+                if self.sync is Durability.STRICT:
+                    _dir_sync(tail_fin)
+                self._synced()
                 self._budget(16) # For the tag
 
-            merged_iter = heapq.merge(
-                *(_reader(p, self.integrity, self.soft, dtype=self.dtype) for p in chunks),
-                key=lambda r: (r["key"], r["tie"], r["seq"])
-            )
-            for r in merged_iter:
-                yield r["val"]
-
-            if tail_fin:
-                yield from _tail_emit(tail_fin, self.rng)
+            self._cascade(chunks)
+            self._synced(final=True)
+            if self.integrity and self.vfirst:
+                for p in chunks:
+                    _drain(_reader(p, True, self.soft, self.win))
+            if self._cpu is not None and len(chunks) > 1 and not _has_counts(chunks, self.soft):
+                merged = self._merge_parallel(chunks)
+            else:
+                runs   = self._merge_runs(chunks, self.integrity and not self.vfirst)
+                merged = (_values(blk, self.rfmt) for blk in runs)
+            tail   = _tail_emit(tail_fin, self.rng, self.integrity, self.soft,
+                                self._tail_mem(), self._fan_in(False), self._budget) if tail_fin else ()
+            head, rest = counts.blocks(self._inf_keys)
+            yield from _rebatch(itertools.chain(head, merged, rest, tail), block_size)
 
         finally:
+            for f in itertools.chain((f for f, _ in pending), () if self._wq is None else (self._wq,)):
+                with contextlib.suppress(Exception):
+                    f.result()
+            self._wq = None
+            for pool in (self._cpu, self._io):
+                if pool is not None:
+                    pool.shutdown()
+            self._io = self._cpu = None
+            self._release()
+            if self._rw is not None:
+                with contextlib.suppress(OSError):
+                    self._rw.fh.close()
+            self._rs = self._rw = None
+
             paths_to_remove = []
             paths_to_remove.extend(chunks)
             if tail_fin and os.path.exists(tail_fin):
@@ -264,119 +1017,588 @@ class XiSort:
                         warnings.warn(f"Temporary directory {self.wd} was not empty during cleanup.")
 
 
+# ────────────────────── block merge ───────────────────────
+def _slices(src: Iterable[np.ndarray], n: int) -> Generator[np.ndarray, None, None]:
+    for a in src:
+        for o in range(0, len(a), n):
+            yield a[o:o + n]
+
+def _upto(a: np.ndarray, c, order: tuple, side: str = "right") -> int:
+    """Length of the prefix of sorted records ``a`` that is ≤ (``side="right"``)
+    or < (``side="left"``) record ``c`` under ``order``."""
+    lo, hi = 0, len(a)
+    for f in order[:-1]:
+        col    = a[f][lo:hi]
+        lo, hi = lo + int(np.searchsorted(col, c[f], "left")), lo + int(np.searchsorted(col, c[f], "right"))
+        if lo == hi:
+            return lo
+    return lo + int(np.searchsorted(a[order[-1]][lo:hi], c[order[-1]], side))
+
+def _bisect_upto(v: np.ndarray, c, order: tuple, side: str) -> int:
+    """:func:`_upto` by bisection, touching O(log n) records of an mmap view."""
+    lo, hi = 0, len(v)
+    for f in order[:-1]:
+        col    = v[f]
+        lo, hi = bisect.bisect_left(col, c[f], lo, hi), bisect.bisect_right(col, c[f], lo, hi)
+    find = bisect.bisect_right if side == "right" else bisect.bisect_left
+    return find(v[order[-1]], c[order[-1]], lo, hi)
+
+def _values(rec: np.ndarray, flags: int) -> np.ndarray:
+    v = rec["val"] if flags & F_VAL else ieee_val(rec["key"])
+    return np.repeat(v, rec["cnt"].astype(np.intp)) if "cnt" in rec.dtype.names else v
+
+def _with_counts(rec: np.ndarray) -> np.ndarray:
+    """Key-only records as (key, count) records of count 1; counted ones as they are."""
+    if "cnt" in rec.dtype.names:
+        return rec
+    out        = np.empty(len(rec), dtype=_run_dtype(F_CNT))
+    out["key"] = rec["key"]
+    out["cnt"] = 1
+    return out
+
+def _collapse(rec: np.ndarray) -> np.ndarray:
+    """Sorted (key, count) records with the counts of equal keys summed."""
+    k = rec["key"]
+    if len(k) < 2 or not np.any(k[1:] == k[:-1]):
+        return rec
+    at        = np.flatnonzero(np.concatenate(([True], k[1:] != k[:-1])))
+    out       = rec[at]
+    out["cnt"] = np.add.reduceat(rec["cnt"], at)
+    return out
+
+def _merge_range(parts: List[np.ndarray], order: tuple, flags: int) -> np.ndarray:
+    """Merge one key range (a slice of every run, in run order) into a new value array."""
+    out, at = np.empty(sum(len(p) for p in parts), dtype=F64), 0
+    for blk in _merge([_slices((p,), MERGE_BLK) for p in parts if len(p)], order):
+        out[at:at + len(blk)] = _values(blk, flags)
+        at += len(blk)
+    return out
+
+def _merge(srcs: List[Iterable[np.ndarray]], order: tuple) -> Generator[np.ndarray, None, None]:
+    """Block-wise k-way merge of sorted record streams.
+
+    Records equal under ``order`` keep source order (then stream order), which
+    is what the implicit ``seq`` of a run asks for.  Every round takes the
+    smallest (last record, source index) over all heads as cutoff; everything
+    at or below it is safe to emit, so those prefixes are cut from each head,
+    concatenated in source order and ordered with one stable ``lexsort``.  The
+    head that supplied the cutoff is always drained, which guarantees progress.
+
+    Sources may reuse their buffers: a source is only advanced after the
+    records taken from its previous array have been copied out.
+    """
+    its   = [iter(s) for s in srcs]
+    heads = {i: h for i, it in enumerate(its) if (h := next(it, None)) is not None}
+    while len(heads) > 1:
+        c   = min(heads, key=lambda i: (tuple(heads[i][-1][f] for f in order), i))
+        cut = heads[c][-1]
+        parts, drained = [], []
+        for i in sorted(heads):
+            h = heads[i]
+            n = _upto(h, cut, order, "right" if i <= c else "left")
+            if n:
+                parts.append(h[:n])
+            heads[i] = h[n:]
+            if n == len(h):
+                drained.append(i)
+        blk = np.concatenate(parts)
+        for i in drained:
+            if (h := next(its[i], None)) is not None:
+                heads[i] = h
+            else:
+                del heads[i]
+        yield blk[np.lexsort([blk[f] for f in reversed(order)])]
+    for i, h in heads.items():
+        yield h
+        yield from its[i]
+
+
 # ────────────────────── tail emit ─────────────────────────
-def _tail_emit(path: str, rng: _R):
-    if not os.path.exists(path) or os.path.getsize(path) <= 16:
-        return
+class _Counts:
+    """Run-length counts of the special values kept out of the runs: ±inf, ±0
+    and each distinct NaN payload.  They are emitted as broadcast blocks where
+    their keys would sort, so repetitive specials cost no records or tail I/O.
+    """
+    __slots__ = ("cls", "nan")
+
+    def __init__(self):
+        self.cls = np.zeros(4, dtype=np.int64)     # -inf, +inf, -0, +0
+        self.nan = {}                              # NaN bits -> count
+
+    def add(self, a: np.ndarray):
+        bad = np.isnan(a)
+        if bad.any():
+            for p, c in zip(*np.unique(a[bad].view(np.uint64), return_counts=True)):
+                self.nan[int(p)] = self.nan.get(int(p), 0) + int(c)
+            a = a[~bad]
+        self.cls += np.bincount(2 * (a == 0.0) + ~np.signbit(a), minlength=4)
 
-    payload_size = os.path.getsize(path) - 16
-    if payload_size <= 0:
+    def blocks(self, keyed_inf: bool) -> tuple:
+        """Blocks to emit (before, after) the merged runs: ±inf at their key
+        positions if ``keyed_inf``, else after ±0 as the tail would be; NaN
+        last, by payload bits."""
+        run  = lambda v, c: np.broadcast_to(np.asarray(v, dtype=F64), (int(c),))
+        ninf, pinf, nz, pz = self.cls
+        infs = [run(-np.inf, ninf), run(np.inf, pinf)]
+        head = infs[:1] if keyed_inf else []
+        rest = (infs[1:] if keyed_inf else []) + [run(-0.0, nz), run(0.0, pz)] + ([] if keyed_inf else infs) \
+               + [run(np.array(p, dtype=np.uint64).view(F64), c) for p, c in sorted(self.nan.items())]
+        return head, rest
+
+def _tail_emit(path: str, rng: _R, integrity: bool, soft: bool, mem: int = TAIL_MEM,
+               fan: int = 128, budget=lambda delta: None) -> Generator[np.ndarray, None, None]:
+    """Yield the NaN/inf tail file at ``path`` in uniformly random order.
+
+    A payload of at most ``mem`` bytes is read, checked and shuffled in
+    memory.  A larger one is scattered window by window into K ≤ ``fan``
+    bucket files of about ``mem / 2`` bytes, each value to a bucket drawn by
+    ``rng.randint``; each bucket is then shuffled in memory and emitted.  A
+    bucket still larger than ``mem`` (the tail outgrew ``fan × mem / 2``) is
+    scattered again the same way rather than loaded.  Every value comes out
+    once, memory stays near one bucket, and the order depends only on the
+    seed.  The tag is checked before any value leaves; ``budget`` is charged
+    for the buckets while they exist.
+    """
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if size <= 16:
         return
+    n = (size - 16) // F64.itemsize
+    if (size - 16) % F64.itemsize:
+        warnings.warn(f"Tail payload size in {os.path.basename(path)} ({size - 16} bytes) is not a multiple of itemsize {F64.itemsize}. Truncating.")
 
-    if payload_size <= 512 * 1024 * 1024: # ≤ 512 MiB
-        mm = None
+    def check(h, tag):
+        if h is not None and not hmac.compare_digest(h.digest(length=16), tag):
+            msg = f"Integrity check failed (tag mismatch) in {os.path.basename(path)}"
+            if soft:
+                warnings.warn(msg)
+            else:
+                raise IOError(msg)
+
+    def spread(fh, n, base, h=None, verify=lambda: None):
+        k     = max(2, min(fan, -(-2 * n * F64.itemsize // mem)))
+        names = [f"{base}.b{i:04d}" for i in range(k)]
+        step  = max(RUN_WIN // F64.itemsize, 1)
+        win   = np.empty(step, dtype=F64)
+        left  = 0
         try:
-            with open(path, "rb") as fh:
-                mm = mmap.mmap(fh.fileno(), payload_size, access=mmap.ACCESS_READ, offset=0)
-                
-                if mm.size() > 0:
-                    current_payload_size = mm.size()
-                    arr_to_yield = None
-
-                    if current_payload_size % F64.itemsize != 0:
-                        warnings.warn(f"Tail payload size in {os.path.basename(path)} ({current_payload_size} bytes) is not a multiple of itemsize {F64.itemsize}. Truncating.")
-                        num_elements = current_payload_size // F64.itemsize
-                        if num_elements > 0:
-                            arr_to_yield = np.frombuffer(mm, dtype=np.float64, count=num_elements).copy()
-                    else:
-                        num_elements = current_payload_size // F64.itemsize
-                        if num_elements > 0:
-                             arr_to_yield = np.frombuffer(mm, dtype=np.float64, count=num_elements).copy()
-                    
-                    if arr_to_yield is not None and arr_to_yield.size > 0:
-                        rng.shuffle(arr_to_yield)
-                        yield from arr_to_yield
-        except FileNotFoundError:
-            warnings.warn(f"Tail file {os.path.basename(path)} not found during emit.")
-            return
-        except Exception as e:
-            warnings.warn(f"Error processing tail file {os.path.basename(path)}: {e}")
-            return
+            budget(n * F64.itemsize)
+            left = n * F64.itemsize
+            outs = [open(p, "wb", WRITE_BUF) for p in names]
+            try:
+                done = 0
+                while done < n:
+                    w = win[:min(step, n - done)]
+                    if _readinto(fh, w.view(np.uint8)) != w.nbytes:
+                        raise IOError(f"Short read in {os.path.basename(base)} at value {done}")
+                    if h is not None:
+                        h.update(w.view(np.uint8))
+                    ids   = rng.randint(k, len(w))
+                    cuts  = np.cumsum(np.bincount(ids, minlength=k))[:-1]
+                    for f, part in zip(outs, np.split(w[np.argsort(ids, kind="stable")], cuts)):
+                        f.write(part)
+                    done += len(w)
+            finally:
+                for f in outs:
+                    f.close()
+            verify()
+            for p in names:
+                nb = os.path.getsize(p)
+                if nb > lim:                                # fan-capped bucket over budget: scatter it again
+                    with open(p, "rb", 0) as sub:
+                        yield from spread(sub, nb // F64.itemsize, p)
+                    vals = None
+                else:
+                    vals = np.fromfile(p, dtype=F64)
+                os.remove(p)
+                left -= nb
+                budget(-nb)
+                if vals is not None:
+                    rng.shuffle(vals)
+                    yield vals
         finally:
-            if mm:
-                mm.close()
-
-    else: # vectorised Vitter-R reservoir for > 512 MiB
-        cap_bytes = 64 * 1024 * 1024
-        cap_elements = cap_bytes // F64.itemsize
-        
-        buf = np.empty(cap_elements, dtype=np.float64)
-        fill = 0 
-        items_processed_by_reservoir_logic = 0
-
-        fd = -1
-        data_map = None
-        try:
-            fd = os.open(path, os.O_RDONLY)
-            data_map = mmap.mmap(fd, payload_size, access=mmap.ACCESS_READ, offset=0)
-
-            if data_map.size() == 0:
-                return
+            for p in names:
+                with contextlib.suppress(OSError):
+                    os.remove(p)
+            budget(-left)
 
-            view_elements = payload_size // F64.itemsize
-            if payload_size % F64.itemsize != 0:
-                warnings.warn(f"Tail payload size in {os.path.basename(path)} ({payload_size} bytes) is not a multiple of itemsize {F64.itemsize}. Truncating.")
-                if view_elements == 0: return
-            
-            view = np.frombuffer(data_map, dtype=np.float64, count=view_elements)
-
-            chunk_size_elements = min(view.size, 1_048_576) 
-            if chunk_size_elements == 0: return
-
-            num_chunks = math.ceil(view.size / chunk_size_elements)
-
-            for i in range(num_chunks):
-                current_mmap_chunk = view[i*chunk_size_elements : (i+1)*chunk_size_elements]
-                elements_to_process_from_chunk = current_mmap_chunk
-                
-                if fill < cap_elements:
-                    take = min(cap_elements - fill, elements_to_process_from_chunk.size)
-                    buf[fill : fill + take] = elements_to_process_from_chunk[:take]
-                    fill += take
-                    elements_to_process_from_chunk = elements_to_process_from_chunk[take:]
-
-                for item_idx_in_remaining_chunk in range(elements_to_process_from_chunk.size):
-                    idx_for_randint = cap_elements + items_processed_by_reservoir_logic
-                    m_arr = rng.randint(idx_for_randint + 1, size=1)
-                    m = m_arr[0]
-                    if m < cap_elements:
-                        buf[m] = elements_to_process_from_chunk[item_idx_in_remaining_chunk]
-                    items_processed_by_reservoir_logic += 1
-        
-        except FileNotFoundError:
-            warnings.warn(f"Tail file {os.path.basename(path)} not found during emit (large file path).")
-            return
-        except Exception as e:
-            warnings.warn(f"Error processing tail file {os.path.basename(path)} (large file path): {e}")
+    lim = max(mem, RUN_WIN)                                 # a bucket up to this is loaded whole
+    h   = blake3.blake3() if integrity else None
+    with open(path, "rb", 0) as fh:
+        fh.seek(size - 16)
+        tag = fh.read(16)
+        fh.seek(0)
+        if n * F64.itemsize <= mem:
+            vals = np.empty(n, dtype=F64)
+            if _readinto(fh, vals.view(np.uint8)) != vals.nbytes:
+                raise IOError(f"Short read in {os.path.basename(path)}")
+            if h is not None:
+                h.update(vals.view(np.uint8))
+            check(h, tag)
+            rng.shuffle(vals)
+            yield vals
             return
-        finally:
-            if data_map:
-                data_map.close()
-            if fd != -1:
-                os.close(fd)
-        
-        if fill > 0:
-            rng.shuffle(buf[:fill])
-            yield from buf[:fill]
-
-
-# ────────────────────── reader ────────────────────────────
-def _reader(path: str, integrity: bool, soft: bool, *, dtype) -> Generator:
+        yield from spread(fh, n, path, h, lambda: check(h, tag))
+
+
+# ────────────────────── run formation ─────────────────────
+def _curve(a: np.ndarray, eps: float) -> np.ndarray:
+    lo, hi  = a.min(), a.max()
+    if not (np.isfinite(lo) and np.isfinite(hi)):   # in-band ±inf/NaN: scale by the finite values, keep the rest
+        out = a.copy()
+        fin = np.isfinite(a)
+        if fin.any():
+            out[fin] = _curve(a[fin], eps)
+        return out
+    span    = hi - lo
+    norm    = np.zeros_like(a) if span <= np.finfo(a.dtype).tiny else (a - lo) / span
+    return norm + eps * np.cos(np.pi * norm)
+
+def _radix_order(cols: List[np.ndarray]) -> np.ndarray:
+    """Stable permutation sorting uint64 columns, the last one most significant.
+
+    LSD radix sort in ``RADIX_BITS`` digits, least significant first: each
+    pass is a stable argsort of one uint16 digit, which numpy runs as a
+    counting sort, and is composed onto the permutation so far.  Digits
+    equal across the whole chunk are skipped.
+    """
+    n, o  = len(cols[0]), None
+    shift = np.empty(n, dtype=np.uint64)
+    digit = np.empty(n, dtype=np.uint16)
+    for c in cols:
+        k = c if o is None else np.take(c, o)
+        for sh in range(0, 64, RADIX_BITS):
+            np.right_shift(k, _U(sh), out=shift)
+            digit[:] = shift
+            if digit.min() == digit.max():
+                continue
+            p = np.argsort(digit, kind="stable")
+            k = np.take(k, p)
+            o = p if o is None else np.take(o, p)
+    return np.arange(n) if o is None else o
+
+def _run_order(key: np.ndarray, tie: np.ndarray | None, radix: bool = False) -> np.ndarray:
+    """Permutation putting one chunk in (key, tie, seq) order.
+
+    ``seq`` rises with chunk position, so any stable sort supplies it.  For
+    VALUE the tie is the key and for INDEX it is ``seq`` itself (``tie`` is
+    None), so a stable sort of the key alone is equivalent.  Random ties
+    need the two-column sort only when some key repeats; ties are in
+    [0, 1), so their bits order like their values for the radix sort.
+    """
+    o = _radix_order([key]) if radix else np.argsort(key, kind="stable")
+    if tie is not None:
+        k = key[o]
+        if np.any(k[1:] == k[:-1]):
+            o = _radix_order([tie.view(np.uint64), key]) if radix else np.lexsort((tie, key))
+    return o
+
+class _Workspace:
+    """Preallocated scratch for forming one run from up to ``len(vals)`` values.
+
+    ``ok`` is the finite mask, ``vals`` the finite values, ``key`` their keys,
+    ``tie`` the random ties and ``rec`` the sorted records; ``tie`` and ``rec``
+    exist only for run formats that store more than the key.
+    """
+    __slots__ = ("ok", "vals", "key", "tie", "rec", "shape", "counted")
+
+    def __init__(self, n: int, flags: int):
+        self.ok   = np.empty(n, dtype=bool)
+        self.vals = np.empty(n, dtype=F64)
+        self.key  = np.empty(n, dtype=np.uint64)
+        self.tie  = np.empty(n, dtype=F64) if flags & F_TIE else None
+        self.rec  = np.empty(n, dtype=_run_dtype(flags)) if flags else None
+        self.shape = None       # presortedness of the last chunk built here
+        self.counted = False    # whether it left as (key, count) records
+
+    @staticmethod
+    def width(flags: int) -> int:
+        """Bytes per value of a workspace for run format ``flags``."""
+        return 17 + 8 * bool(flags & F_TIE) + (_run_dtype(flags).itemsize if flags else 0)
+
+def _build_run(ws: _Workspace, n: int, tie: np.ndarray | None, flags: int, eps: float | None,
+               kernel: SortKernel = SortKernel.AUTO, inf_keys: bool = False, rle: bool = False) -> np.ndarray:
+    """Sorted run records for the first ``n`` values in ``ws`` (``eps`` None = STRICT).
+
+    Records are built in ``ws`` and stay valid until it is reused.  Key-only
+    runs sort the key array in place: equal keys are equal records, so the
+    sort need not be stable.  Depends only on its arguments, so it may run on
+    any worker thread.
+
+    One pass counts the descents first and sets ``ws.shape``: ``ascending``
+    chunks are copied as they are, strictly ``descending`` ones reversed, and
+    ``nearly`` sorted ones (at most ``n >> NEAR_SHIFT`` descents) take the
+    stable sort, which is adaptive, instead of the unstable one.
+
+    ``kernel`` picks the sort for the rest.  AUTO radix-sorts permutations of
+    at least ``RADIX_MIN`` records and leaves key-only runs to numpy's
+    unstable sort, which is faster than a radix sort done in numpy passes;
+    RADIX and NUMPY force one or the other.  ``inf_keys`` keys ±inf in place
+    (see :func:`ieee_key`) for chunks that keep them.
+
+    With ``rle`` a key-only run with at most ``RLE_RATIO`` distinct keys per
+    value comes back as new (key, count) records, ``F_CNT``, one per key.
+    """
+    vals = ws.vals[:n]
+    key  = ieee_key(vals if eps is None else _curve(vals, eps), out=ws.key[:n], finite_inf=inf_keys)
+    down = int(np.count_nonzero(key[1:] < key[:-1]))
+    if not down and tie is not None:
+        eq   = key[1:] == key[:-1]
+        down = int(np.count_nonzero(tie[1:][eq] < tie[:-1][eq])) if eq.any() else 0
+    ws.counted = False
+    ws.shape = "ascending" if not down else "descending" if down == n - 1 else \
+               "nearly" if down <= n >> NEAR_SHIFT else "random"
+    radix = kernel is SortKernel.RADIX or \
+            (kernel is SortKernel.AUTO and flags and ws.shape == "random" and n >= RADIX_MIN)
+    if not flags:
+        if ws.shape == "descending":
+            key[:] = key[::-1]
+        elif radix and ws.shape != "ascending":
+            key[:] = np.take(key, _radix_order([key]))
+        elif ws.shape != "ascending":
+            key.sort(kind="stable" if ws.shape == "nearly" else None)
+        if rle and n > 1:
+            new = key[1:] != key[:-1]
+            if np.count_nonzero(new) + 1 <= n * RLE_RATIO:
+                at         = np.flatnonzero(np.concatenate(([True], new)))
+                rec        = np.empty(len(at), dtype=_run_dtype(F_CNT))
+                rec["key"] = key[at]
+                rec["cnt"] = np.diff(np.append(at, n))
+                ws.counted = True
+                return rec
+        return key.view(_run_dtype(flags))
+    rec  = ws.rec[:n]
+    cols = [("key", key)] + [("tie", tie)] * (tie is not None) + [("val", vals)] * bool(flags & F_VAL)
+    if ws.shape in ("ascending", "descending"):
+        step = 1 if ws.shape == "ascending" else -1
+        for f, c in cols:
+            rec[f] = c[::step]
+    else:
+        o = _run_order(key, tie, radix)
+        for f, c in cols:
+            np.take(c, o, out=rec[f], mode="clip")
+    return rec
+
+def _best_k(rec: np.ndarray, k: int, order: tuple, largest: bool = False) -> np.ndarray:
+    """The first ``k`` (last if ``largest``) of records ``rec`` under
+    ``order``, sorted.  ``np.partition`` finds the cut key; only records on
+    the right side of it, ties with it included, are sorted."""
+    if len(rec) > k:
+        at  = len(rec) - k if largest else k - 1
+        cut = np.partition(rec["key"], at)[at]
+        rec = rec[rec["key"] >= cut if largest else rec["key"] <= cut]
+    rec = rec[np.lexsort([rec[f] for f in reversed(order)])]
+    return rec[max(len(rec) - k, 0):] if largest else rec[:k]
+
+def _merge_sorted(parts: List[np.ndarray], order: tuple) -> np.ndarray:
+    """Stable merge of sorted record arrays into a new array, earlier parts
+    first among equals.
+
+    The stable argsort of the concatenated keys finds the existing runs and
+    merges them in linear time; the two-column ``lexsort`` is needed only when
+    keys repeat under random ties.
+    """
+    c = np.concatenate(parts)
+    return c[_run_order(c["key"], c["tie"] if len(order) > 1 else None)]
+
+class _Replacer:
+    """Replacement selection (Knuth 5.4.1) over sorted record blocks.
+
+    Holds at most ``cap`` records.  The selection tree of the classic
+    algorithm is ``pool``, the sorted records that may still join the open
+    run; ``nxt`` keeps those that arrived below the run's last output and
+    wait for the next run.  Each pushed block is split at that last record,
+    its upper part merged into ``pool``, and the smallest records leave until
+    ``cap`` holds again; an empty pool ends the run.  Runs average about
+    2·``cap`` records on random input and are unbounded on ascending input.
+
+    :meth:`push` and :meth:`close` return what to write, in order: record
+    arrays, with ``None`` where a run ends.  Equal records keep input order,
+    both within a run and across runs.
+    """
+    __slots__ = ("cap", "order", "pool", "nxt", "held", "last")
+
+    def __init__(self, cap: int, order: tuple, dtype: np.dtype):
+        self.cap, self.order = cap, order
+        self.pool            = np.empty(0, dtype=dtype)
+        self.nxt: List[np.ndarray] = []
+        self.held            = 0            # records in nxt
+        self.last            = None         # last record written to the open run
+
+    def push(self, blk: np.ndarray) -> list:
+        if self.last is not None:
+            cut = _upto(blk, self.last, self.order, side="left")
+            if cut:
+                self.nxt.append(blk[:cut])
+                self.held += cut
+            blk = blk[cut:]
+        if len(blk):
+            self.pool = _merge_sorted([self.pool, blk], self.order) if len(self.pool) else blk
+        out  = []
+        over = len(self.pool) + self.held - self.cap
+        while over > 0:
+            take = min(over, len(self.pool))
+            if take:
+                out.append(self.pool[:take])
+                self.last, self.pool = self.pool[take - 1], self.pool[take:]
+                over -= take
+            if not len(self.pool):
+                self._next_run(out)
+        return out
+
+    def close(self) -> list:
+        out = []
+        while len(self.pool):
+            out.append(self.pool)
+            self.last, self.pool = self.pool[-1], self.pool[:0]
+            self._next_run(out)
+        return out
+
+    def _next_run(self, out: list):
+        if self.last is not None:
+            out.append(None)
+        self.pool = _merge_sorted(self.nxt, self.order) if self.nxt else self.pool
+        self.nxt, self.held, self.last = [], 0, None
+
+
+# ────────────────────── run files ─────────────────────────
+def _store_run(path: str, blocks: Iterable[np.ndarray], flags: int,
+               sync: Durability = Durability.STRICT) -> int:
+    """Write one run, syncing its directory under STRICT durability; returns
+    its size for scratch accounting."""
+    _write_run(path, blocks, flags)
+    if sync is Durability.STRICT:
+        _dir_sync(path)
+    return os.path.getsize(path)
+
+def _prefetch(src: Iterable, pool: ThreadPoolExecutor) -> Generator:
+    """Yield from ``src`` while its next item is produced on ``pool``."""
+    it  = iter(src)
+    fut = pool.submit(next, it, None)
+    try:
+        while (item := fut.result()) is not None:
+            fut = pool.submit(next, it, None)
+            yield item
+    finally:
+        fut.cancel()
+        with contextlib.suppress(Exception):
+            fut.result()
+        if hasattr(it, "close"):
+            it.close()
+
+class _RunWriter:
+    """One run being written block by block; :meth:`close` adds footer and tag.
+
+    Records are hashed straight from the arrays' memory and written through a
+    ``WRITE_BUF`` buffer, so small blocks and the trailer coalesce while large
+    blocks go to the file directly.
+    """
+    __slots__ = ("path", "flags", "fh", "h", "count", "last")
+
+    def __init__(self, path: str, flags: int):
+        self.path, self.flags = path, flags
+        self.fh, self.h       = open(path, "wb", WRITE_BUF), blake3.blake3()
+        self.count, self.last = 0, None     # last: copy of the last record written
+
+    def write(self, rec: np.ndarray):
+        self.put(self.note(rec))
+
+    def note(self, rec: np.ndarray) -> np.ndarray:
+        """Account for ``rec`` (count, last record) ahead of :meth:`put`, which
+        may run later on another thread."""
+        self.count += len(rec)
+        if len(rec):
+            self.last = rec[-1].copy()
+        return rec
+
+    def put(self, rec: np.ndarray):
+        raw = np.ascontiguousarray(rec).view(np.uint8)
+        self.h.update(raw)
+        self.fh.write(raw)
+
+    def close(self):
+        with self.fh:
+            foot = _FOOT.pack(RUN_MAGIC, RUN_VERSION, self.flags, self.count)
+            self.h.update(foot)
+            self.fh.write(foot)
+            self.fh.write(self.h.digest(length=16))
+
+def _write_run(path: str, blocks: Iterable[np.ndarray], flags: int):
+    """Write sorted record arrays as one run: records, footer, tag."""
+    w = _RunWriter(path, flags)
+    try:
+        for rec in blocks:
+            w.write(rec)
+    except BaseException:
+        w.fh.close()
+        raise
+    w.close()
+
+def _readinto(fh, raw: np.ndarray) -> int:
+    mv, got = memoryview(raw), 0
+    while got < len(mv):
+        n = fh.readinto(mv[got:])
+        if not n:
+            break
+        got += n
+    return got
+
+def _footer(path: str, soft: bool):
+    """Validate a run's footer; returns (payload_size, dtype, footer, tag), or
+    None after a warning when ``soft``."""
+    size = os.path.getsize(path)
+    if size < _FOOT.size + 16:
+        msg = f"File {os.path.basename(path)} is smaller ({size} bytes) than a run footer and tag ({_FOOT.size + 16} bytes)."
+        if soft: warnings.warn(msg)
+        else: raise IOError(msg)
+        return None
+
+    payload_size = size - _FOOT.size - 16
+    with open(path, "rb") as fh:
+        fh.seek(payload_size)
+        foot, tag_from_file = fh.read(_FOOT.size), fh.read(16)
+    magic, version, flags, count = _FOOT.unpack(foot)
+    if magic != RUN_MAGIC or version != RUN_VERSION:
+        msg = f"File {os.path.basename(path)} is not a version {RUN_VERSION} ΞSort run."
+        if soft: warnings.warn(msg)
+        else: raise IOError(msg)
+        return None
+
+    dtype        = _run_dtype(flags)
+    rec_itemsize = dtype.itemsize
+    if payload_size != count * rec_itemsize:
+        msg = f"Payload size in {os.path.basename(path)} ({payload_size} bytes) does not match its footer ({count} records of {rec_itemsize} bytes)."
+        if soft:
+            warnings.warn(msg + " Truncating to fit.")
+            payload_size = (min(payload_size, count * rec_itemsize) // rec_itemsize) * rec_itemsize
+        else:
+            raise IOError(msg)
+    return payload_size, dtype, foot, tag_from_file
+
+def _has_counts(paths: List[str], soft: bool) -> bool:
+    """Whether any run in ``paths`` holds (key, count) records."""
+    return any(info is not None and "cnt" in info[1].names for info in (_footer(p, soft) for p in paths))
+
+def _map_run(path: str, soft: bool):
+    """Read-only mmap of a run (None if empty), its records as a zero-copy
+    view and its :func:`_footer` info."""
+    info = _footer(path, soft)
+    if info is None or info[0] == 0:
+        return None, np.empty(0, dtype=info[1] if info else _run_dtype(0)), info
+    with open(path, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), info[0], access=mmap.ACCESS_READ)
+    return mm, np.frombuffer(mm, dtype=info[1]), info
+
+def _reader(path: str, integrity: bool, soft: bool, window: int = RUN_WIN, *, nbuf: int = 1) -> Generator:
+    """Yield the records of one run in windows of at most ``window`` bytes.
+
+    Windows are ``readinto`` a ring of ``nbuf`` reused buffers, so a yielded
+    array stays valid until ``nbuf`` more have been requested; memory per open
+    run is ``nbuf`` windows.  The tag is checked once the last window has been
+    handed out.
+    """
     if not os.path.exists(path):
         return
 
-    size = os.path.getsize(path)
-    
     def _handle_integrity_error_closure(filename_for_error):
         def _handle():
             msg = f"Integrity check failed (tag mismatch) in {filename_for_error}"
@@ -387,94 +1609,43 @@ def _reader(path: str, integrity: bool, soft: bool, *, dtype) -> Generator:
         return _handle
     _handle_integrity_error = _handle_integrity_error_closure(os.path.basename(path))
 
-    if size <= 16: 
-        if integrity:
-            expected_payload_size = 0 # For this branch, payload is effectively 0 or file is too small
-            tag_size_to_read = 16
-            if size < 16 : 
-                 msg = f"File {os.path.basename(path)} is smaller ({size} bytes) than an integrity tag (16 bytes)."
-                 if soft: warnings.warn(msg)
-                 else: raise IOError(msg)
-                 return 
-            
-            with open(path, "rb") as fh:
-                # If size == 16, it's just a tag for an empty payload. Read all 16 bytes.
-                # If size > 16 (but this branch is for size <= 16), this case isn't hit.
-                # So, fh.read(16) is correct if size == 16.
-                tag_from_file = fh.read(tag_size_to_read) 
-            
-            computed_tag = blake3.blake3(b'').digest(length=16)
-            if not hmac.compare_digest(computed_tag, tag_from_file):
-                _handle_integrity_error()
-        return 
-
-    payload_size = size - 16
+    info = _footer(path, soft)
+    if info is None:
+        return
+    payload_size, dtype, foot, tag_from_file = info
     rec_itemsize = dtype.itemsize
-    
-    if payload_size % rec_itemsize != 0:
-        msg = f"Payload size in {os.path.basename(path)} ({payload_size} bytes) is not a multiple of record size ({rec_itemsize} bytes)."
-        if soft:
-            warnings.warn(msg + " Truncating to fit.")
-            payload_size = (payload_size // rec_itemsize) * rec_itemsize
-            # If payload_size becomes 0 after truncation, it's handled by the next block
-        else:
-            raise IOError(msg)
-    
+
     if payload_size == 0: 
         if integrity:
-            # This assumes the tag for an "effectively empty" payload (due to truncation or actual)
-            # is calculated over b'' and is located right after the original payload data.
-            # The file structure is [payload_data][tag]. Tag is always at offset `original_file_size - 16`.
-            # If effective payload_size is 0, we still compare against hash of b''.
-            with open(path, "rb") as fh_tag_check:
-                fh_tag_check.seek(size - 16) # Go to where the tag is physically stored
-                tag_from_file = fh_tag_check.read(16)
-            computed_tag = blake3.blake3(b'').digest(length=16) # Expect hash of empty if effective payload is 0
+            computed_tag = blake3.blake3(foot).digest(length=16)
             if not hmac.compare_digest(computed_tag, tag_from_file):
                 _handle_integrity_error()
         return
 
     # At this point, payload_size > 0 and is a multiple of rec_itemsize.
-    win_size = math.lcm(WIN0, rec_itemsize)
+    nrec = payload_size // rec_itemsize
+    step = max(window // rec_itemsize, 1)
+    bufs = [np.empty(min(step, nrec), dtype=dtype) for _ in range(nbuf)]
+    h    = blake3.blake3() if integrity else None
 
-    with open(path, "rb") as fh:
-        if payload_size < win_size or sys.maxsize < (1 << 33): # Small file or 32-bit Python
-            computed_tag_for_payload = None
-            if integrity:
-                with mmap.mmap(fh.fileno(), payload_size, access=mmap.ACCESS_READ, offset=0) as temp_mm_for_hash:
-                    computed_tag_for_payload = blake3.blake3(temp_mm_for_hash).digest(length=16)
-            
-            with mmap.mmap(fh.fileno(), payload_size, access=mmap.ACCESS_READ, offset=0) as mm:
-                for record in np.frombuffer(mm, dtype=dtype).copy(): # FIX APPLIED
-                    yield record
-            
-            if integrity:
-                fh.seek(payload_size, os.SEEK_SET) 
-                tag_from_file = fh.read(16)
-                if computed_tag_for_payload is None: 
-                     warnings.warn(f"Internal issue: computed_tag_for_payload is None for {os.path.basename(path)} with payload_size {payload_size}")
-                     computed_tag_for_payload = blake3.blake3(b'').digest(length=16) 
-
-                if not hmac.compare_digest(computed_tag_for_payload, tag_from_file):
-                    _handle_integrity_error()
-            return
+    with open(path, "rb", 0) as fh:
+        done = i = 0
+        while done < nrec:
+            n   = min(step, nrec - done)
+            win = bufs[i % nbuf][:n]
+            i  += 1
+            raw = win.view(np.uint8)
+            if _readinto(fh, raw) != raw.size:
+                raise IOError(f"Short read in {os.path.basename(path)} at record {done}")
+            if h is not None:
+                h.update(raw)
+            done += n
+            if done < nrec and _FADVISE:
+                os.posix_fadvise(fh.fileno(), done * rec_itemsize, min(step, nrec - done) * rec_itemsize,
+                                 os.POSIX_FADV_WILLNEED)
+            yield win
 
-        else: # Large file on 64-bit Python: mmap in windows
-            h = blake3.blake3() if integrity else None
-            off = 0
-            while off < payload_size:
-                current_read_size = min(win_size, payload_size - off)
-                if current_read_size == 0: break
-
-                with mmap.mmap(fh.fileno(), current_read_size, access=mmap.ACCESS_READ, offset=off) as mm_window:
-                    if integrity and h is not None:
-                        h.update(mm_window)
-                    for record in np.frombuffer(mm_window, dtype=dtype).copy(): # FIX APPLIED
-                        yield record
-                off += current_read_size
-            
-            if integrity and h is not None:
-                fh.seek(payload_size, os.SEEK_SET) 
-                tag_from_file = fh.read(16)
-                if not hmac.compare_digest(h.digest(length=16), tag_from_file):
-                    _handle_integrity_error()
+    if h is not None:
+        h.update(foot)
+        if not hmac.compare_digest(h.digest(length=16), tag_from_file):
+            _handle_integrity_error()
@@ -0,0 +1,87 @@
+"""stream_sort_blocks against a reference (key, tie, seq) sort.
+
+The reference keys each chunk's finite values (and zeros in CURVED mode) as
+run formation does, draws RANDOM/SHUFFLE ties from the same seeded stream in
+chunk order, numbers values by input position, and sorts by (key, tie, seq);
+the counted ±inf, ±0 and NaN blocks go where :meth:`_Counts.blocks` puts
+them.  Every pool, kernel, fan-in and spilling option must reproduce it bit
+for bit.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import XiSort, Mode, TieBreak, SortKernel, Specials, ieee_key, _curve, _R   # noqa: E402
+
+SEED, N = 7, 20_000
+
+def data() -> np.ndarray:
+    r = np.random.default_rng(3)
+    a = np.round(r.standard_normal(N), 1)                  # few distinct keys: RLE runs
+    a[r.integers(0, N, N // 50)]  = np.nan
+    a[r.integers(0, N, N // 100)] = np.uint64(0x7FF8_0000_0000_0123).view(np.float64)
+    a[r.integers(0, N, N // 100)] = np.inf
+    a[r.integers(0, N, N // 100)] = -np.inf
+    a[r.integers(0, N, N // 30)]  = -0.0
+    a[r.integers(0, N, N // 30)]  = 0.0
+    return a
+
+def reference(a: np.ndarray, chunk: int, mode: Mode, tie: TieBreak, specials: Specials) -> np.ndarray:
+    rng, keys, ties, vals = _R(SEED), [], [], []
+    for o in range(0, len(a), chunk):
+        c  = a[o:o + chunk]
+        ok = np.isfinite(c) & ((c != 0.0) if mode is Mode.STRICT else True)
+        v  = c[ok]
+        vals.append(v)
+        keys.append(ieee_key(v if mode is Mode.STRICT else _curve(v, 0.01)) if len(v) else v.view(np.uint64))
+        ties.append(rng.rand(len(v)) if tie in (TieBreak.RANDOM, TieBreak.SHUFFLE) else np.zeros(len(v)))
+    key, tie, vals = np.concatenate(keys), np.concatenate(ties), np.concatenate(vals)
+    merged = vals[np.lexsort((np.arange(len(vals)), tie, key))]
+
+    count  = lambda m, v: np.full(int(np.count_nonzero(m)), v)
+    ninf, pinf = count(a == -np.inf, -np.inf), count(a == np.inf, np.inf)
+    zeros  = [count((a == 0.0) & np.signbit(a), -0.0), count((a == 0.0) & ~np.signbit(a), 0.0)] \
+             if mode is Mode.STRICT else []
+    nan    = np.sort(a[np.isnan(a)].view(np.uint64)).view(np.float64)
+    if specials is Specials.TAIL:
+        return np.concatenate([merged] + zeros + [ninf, pinf, nan])
+    return np.concatenate([ninf, merged, pinf] + zeros + [nan])
+
+OPTIONS = {
+    "held":      dict(chunk_size=4096),
+    "one-chunk": dict(chunk_size=N + 1),
+    "spilled":   dict(chunk_size=1000, mem_limit=1),
+    "workers":   dict(chunk_size=1000, mem_limit=1, workers=3),
+    "io":        dict(chunk_size=1000, mem_limit=1, io_threads=2),
+    "pools":     dict(chunk_size=1000, mem_limit=1, workers=2, io_threads=2),
+    "fan-in-2":  dict(chunk_size=1000, mem_limit=1, max_fan_in=2),
+    "radix":     dict(chunk_size=4096, mem_limit=1, sort_kernel=SortKernel.RADIX),
+    "rsel":      dict(chunk_size=4096, mem_limit=1, replacement_selection=True),
+    "inf":       dict(chunk_size=1000, mem_limit=1, specials=Specials.INF),
+    "inline":    dict(chunk_size=1000, mem_limit=1, specials=Specials.INLINE),
+}
+
+@pytest.mark.parametrize("opts", OPTIONS.values(), ids=OPTIONS.keys())
+@pytest.mark.parametrize("tie", list(TieBreak), ids=lambda t: t.value)
+@pytest.mark.parametrize("mode", list(Mode), ids=lambda m: m.value)
+def test_matches_reference(tmp_path, mode, tie, opts):
+    opts  = dict(opts)
+    chunk = opts.pop("chunk_size")
+    s     = XiSort(mode=mode, tie_break=tie, seed=SEED, tmpdir=str(tmp_path), **opts)
+    a     = data()
+    out   = np.concatenate(list(s.stream_sort_blocks(a, chunk_size=chunk, block_size=777)))
+    ref   = reference(a, chunk, mode, tie, s.specials)
+    assert np.array_equal(out.view(np.uint64), ref.view(np.uint64))
+
+def test_inline_specials_uncounted(tmp_path):
+    """With counting off, ±inf, ±0 and the default NaN are keyed in the runs;
+    the payload NaN takes the tail, and all its copies share their bits."""
+    a = data()
+    s = XiSort(seed=SEED, specials=Specials.INLINE, count_specials=False, mem_limit=1, tmpdir=str(tmp_path))
+    out = np.concatenate(list(s.stream_sort_blocks(a, chunk_size=1000)))
+    ref = reference(a, 1000, Mode.STRICT, TieBreak.VALUE, Specials.INLINE)
+    assert np.array_equal(out.view(np.uint64), ref.view(np.uint64))